@@ -0,0 +1,201 @@
+"""
+Benchmarks for GpsClient and the entity fan-out, against the local stand-in.
+
+Reports, per scenario, the requests made, wall time, memory still allocated
+at the end and at peak (tracemalloc), and for refresh cycles how many entity
+state writes the snapshot diff causes.
+
+    python -m benchmarks.run --devices 500 --cycles 20 --output bench_output.txt
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List
+
+from custom_components.one2track.client import One2TrackConfig, get_client
+from custom_components.one2track.device_tracker import One2TrackTracker
+from custom_components.one2track.sensor import ICON_MAPPING, One2TrackHistorySensor
+from custom_components.one2track.snapshot import build_snapshot
+
+from .standin import ACCOUNT_ID, PASSWORD, USERNAME, StandInServer, pointed_at
+
+HISTORY_STATISTICS = ("distance_today", "max_speed_today", "time_at_location")
+
+
+def _watched_fields_per_device() -> List[frozenset]:
+    """The watched fields of every entity created for one device."""
+    sensors = [frozenset({attribute}) for attribute in ICON_MAPPING if attribute not in HISTORY_STATISTICS]
+    history = [One2TrackHistorySensor._watched_fields] * len(HISTORY_STATISTICS)
+    return [One2TrackTracker._watched_fields, *sensors, *history]
+
+
+class Measurement:
+    def __init__(self, server: StandInServer) -> None:
+        self.server = server
+        self.requests = 0
+        self.wall = 0.0
+        self.allocated = 0
+        self.peak = 0
+        self.error = None
+
+
+@contextmanager
+def measure(server: StandInServer):
+    result = Measurement(server)
+    requests_before = sum(server.counts.values())
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    except Exception as err:
+        # Injected errors surface as exceptions; keep measuring
+        result.error = err
+    finally:
+        result.wall = time.perf_counter() - start
+        result.allocated, result.peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result.requests = sum(server.counts.values()) - requests_before
+
+
+class Report:
+    def __init__(self, out) -> None:
+        self.out = out
+
+    def header(self, title: str) -> None:
+        print(f"\n{title}", file=self.out)
+        print(f"{'scenario':<40}{'requests':>10}{'wall ms':>12}{'kept KiB':>12}{'peak KiB':>12}{'writes':>10}",
+              file=self.out)
+
+    def row(self, name: str, requests, wall: float, allocated: int, peak: int, writes="") -> None:
+        print(f"{name:<40}{requests:>10}{wall * 1000:>12.1f}{allocated / 1024:>12.1f}{peak / 1024:>12.1f}{writes:>10}",
+              file=self.out)
+
+    def measurement(self, name: str, result: Measurement, writes="") -> None:
+        if result.error is not None:
+            name = f"{name} [failed]"
+        self.row(name, result.requests, result.wall, result.allocated, result.peak, writes)
+
+
+async def bench_client(args, report: Report) -> None:
+    server = StandInServer(args.devices, args.latency, args.error_rate)
+    base_url = await server.start()
+    config = One2TrackConfig(username=USERNAME, password=PASSWORD, id=ACCOUNT_ID)
+    report.header(f"GpsClient, {args.devices} devices, {args.latency * 1000:.0f} ms latency, "
+                  f"{args.error_rate:.0%} errors")
+
+    with pointed_at(base_url):
+        client = get_client(config)
+        try:
+            with measure(server) as result:
+                await client.update()
+            report.measurement("cold update (login + fetch)", result)
+
+            walls, requests = [], []
+            allocated = peak = failed = 0
+            for _ in range(args.cycles):
+                server.advance(args.moving)
+                with measure(server) as result:
+                    await client.update()
+                failed += result.error is not None
+                walls.append(result.wall)
+                requests.append(result.requests)
+                allocated = max(allocated, result.allocated)
+                peak = max(peak, result.peak)
+            report.row("warm update (mean)", f"{statistics.mean(requests):.1f}", statistics.mean(walls), allocated, peak)
+            report.row("warm update (max)", max(requests), max(walls), allocated, peak)
+            if failed:
+                print(f"{failed} of {args.cycles} warm updates failed", file=report.out)
+
+            server.expire_sessions()
+            with measure(server) as result:
+                await client.update()
+            report.measurement("update after session expiry", result)
+
+            uuids = [device["uuid"] for device in server.devices]
+            with measure(server) as result:
+                await client.send_device_command(uuids[0], "0039")
+            report.measurement("send_device_command (1 device)", result)
+
+            with measure(server) as result:
+                await client.send_device_commands([(uuid, "0039", None) for uuid in uuids])
+            report.measurement(f"send_device_commands ({len(uuids)})", result)
+
+            with measure(server) as result:
+                await client.send_device_messages(uuids, "Dinner is ready")
+            report.measurement(f"send_device_messages ({len(uuids)})", result)
+        finally:
+            await client.close()
+            await server.stop()
+
+
+def bench_fan_out(args, report: Report) -> None:
+    """State writes per refresh cycle caused by the snapshot diff."""
+    from custom_components.one2track.client import Device
+
+    server = StandInServer(args.devices)
+    entities = _watched_fields_per_device()
+    report.header(f"Entity fan-out, {args.devices} devices x {len(entities)} entities, "
+                  f"{args.moving:.0%} moving per cycle")
+
+    snapshot = None
+    writes: List[int] = []
+    callbacks: List[int] = []
+    walls: List[float] = []
+    for _ in range(args.cycles):
+        server.advance(args.moving)
+        devices = [Device.from_dict(device) for device in server.devices]
+        start = time.perf_counter()
+        snapshot, changes = build_snapshot(snapshot, devices)
+        walls.append(time.perf_counter() - start)
+        writes.append(sum(
+            1 for fields in changes.values() for watched in entities if not fields.isdisjoint(watched)
+        ))
+        # Entities are only called back for devices that changed
+        callbacks.append(sum(len(entities) for fields in changes.values() if fields))
+
+    # The first cycle creates every entity; report steady state separately
+    report.row("first snapshot", "-", walls[0], 0, 0, writes[0])
+    steady_writes = writes[1:] or writes
+    steady_walls = walls[1:] or walls
+    report.row("snapshot diff (mean)", "-", statistics.mean(steady_walls), 0, 0, f"{statistics.mean(steady_writes):.0f}")
+    report.row("naive (every entity)", "-", 0, 0, 0, args.devices * len(entities))
+    steady_callbacks = callbacks[1:] or callbacks
+    print(f"entity callbacks per cycle: {statistics.mean(steady_callbacks):.0f} "
+          f"(every entity: {args.devices * len(entities)})", file=report.out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--moving", type=float, default=0.1, help="fraction of watches moving per cycle")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the integration's log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Injected errors are expected; keep them out of the report
+        logging.getLogger("custom_components.one2track").setLevel(logging.CRITICAL)
+
+    out = sys.stdout
+    if args.output:
+        out = open(args.output, "w")
+    try:
+        report = Report(out)
+        asyncio.run(bench_client(args, report))
+        bench_fan_out(args, report)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+            print(open(args.output).read())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Local stand-in for the One2Track web portal.
+
+Emulates just enough of www.one2trackgps.com for GpsClient: the sign-in page
+with its CSRF token and _iadmin cookie, the redirect to /users/<id>/devices,
+the devices JSON and the functions/messages endpoints. Fleet size, latency
+and error injection are configurable so the client can be exercised against
+hundreds of watches without touching the real service.
+
+Run standalone with:
+
+    python -m benchmarks.standin --devices 500 --port 8080
+"""
+import argparse
+import asyncio
+import random
+import secrets
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from aiohttp import web
+
+SESSION_COOKIE = "_iadmin"
+ACCOUNT_ID = "1234"
+USERNAME = "bench@example.com"
+PASSWORD = "bench"
+
+# The real pages are large; the CSRF meta tag sits in the head
+PAGE_PADDING = 150 * 1024
+
+
+def _page(csrf: str) -> str:
+    return (
+        '<!DOCTYPE html><html><head><meta name="csrf-param" content="authenticity_token" />'
+        f'<meta name="csrf-token" content="{csrf}" /></head><body>'
+        + "<div>" * (PAGE_PADDING // 5)
+        + "</body></html>"
+    )
+
+
+class StandInServer:
+    """
+    aiohttp application emulating the portal.
+
+    latency delays every response, error_rate makes that fraction of requests
+    fail with error_status. A location request (0039) makes the watch report a
+    new fix after fix_delay seconds. Every request is counted per endpoint in
+    counts.
+    """
+
+    def __init__(self, fleet_size: int = 10, latency: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, seed: int = 0, fix_delay: float = 20.0) -> None:
+        self.latency = latency
+        self.fix_delay = fix_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.counts: Counter = Counter()
+        self.bytes_sent = 0
+        self.sessions = set()
+        self.csrf: Dict[str, str] = {}
+        self.random = random.Random(seed)
+        self.now = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        self.devices: List[dict] = [self._make_device(index) for index in range(fleet_size)]
+        self.runner = None
+        self.base_url = None
+
+    def _make_device(self, index: int) -> dict:
+        timestamp = self.now.isoformat()
+        return {
+            "id": index,
+            "serial_number": f"8600{index:08d}",
+            "name": f"Watch {index}",
+            "phone_number": f"+3160{index:07d}",
+            "status": "GPS",
+            "uuid": f"{index:08x}-0000-4000-8000-000000000000",
+            "last_location": {
+                "id": index,
+                "last_communication": timestamp,
+                "last_location_update": timestamp,
+                "address": f"Street {index}, Amsterdam",
+                "latitude": 52.3 + self.random.uniform(-0.1, 0.1),
+                "longitude": 4.9 + self.random.uniform(-0.1, 0.1),
+                "accuracy": 15.0,
+                "altitude": 2.0,
+                "location_type": "GPS",
+                "signal_strength": -70,
+                "satellite_count": 8,
+                "speed": 0.0,
+                "battery_percentage": 80,
+                "host": "10.0.0.1",
+                "port": 5000 + index,
+            },
+            "simcard": {"balance_cents": 1000, "tariff_type": "prepaid"},
+        }
+
+    # Scenario controls
+
+    def advance(self, moving: float = 0.0, seconds: int = 60) -> None:
+        """Let time pass: every watch checks in, a fraction of them moves."""
+        self.now += timedelta(seconds=seconds)
+        timestamp = self.now.isoformat()
+        for device in self.devices:
+            location = device["last_location"]
+            location["last_communication"] = timestamp
+            if self.random.random() < moving:
+                location["latitude"] += self.random.uniform(-0.002, 0.002)
+                location["longitude"] += self.random.uniform(-0.002, 0.002)
+                location["last_location_update"] = timestamp
+                location["speed"] = round(self.random.uniform(3, 15), 1)
+            else:
+                location["speed"] = 0.0
+
+    def report_fix(self, uuid: str) -> None:
+        """The watch reports a fresh fix, as it does some time after a 0039 request."""
+        self.now += timedelta(seconds=1)
+        for device in self.devices:
+            if device["uuid"] == uuid:
+                device["last_location"]["last_location_update"] = self.now.isoformat()
+
+    def expire_sessions(self) -> None:
+        self.sessions.clear()
+        self.csrf.clear()
+
+    # Request handling
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.counts[request.match_info.route.name or request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.Response(status=self.error_status, text="injected error")
+        response = await handler(request)
+        if response.body is not None:
+            self.bytes_sent += len(response.body)
+        return response
+
+    def _session(self, request):
+        cookie = request.cookies.get(SESSION_COOKIE)
+        return cookie if cookie in self.sessions else None
+
+    def _issue_csrf(self, cookie: str) -> str:
+        token = self.csrf[cookie] = secrets.token_urlsafe(32)
+        return token
+
+    async def _sign_in_page(self, request):
+        cookie = secrets.token_hex(16)
+        response = web.Response(text=_page(self._issue_csrf(cookie)), content_type="text/html")
+        response.set_cookie(SESSION_COOKIE, cookie)
+        return response
+
+    async def _sign_in(self, request):
+        form = await request.post()
+        cookie = request.cookies.get(SESSION_COOKIE)
+        if form.get("authenticity_token") != self.csrf.get(cookie):
+            return web.Response(status=422, text="Invalid authenticity token")
+        if form.get("user[login]") != USERNAME or form.get("user[password]") != PASSWORD:
+            return web.Response(status=200, text=_page(self._issue_csrf(cookie)), content_type="text/html")
+
+        session = secrets.token_hex(16)
+        self.sessions.add(session)
+        self.csrf[session] = self.csrf.pop(cookie)
+        response = web.Response(status=302, headers={"Location": f"{self.base_url}/"})
+        response.set_cookie(SESSION_COOKIE, session)
+        return response
+
+    async def _root(self, request):
+        if self._session(request) is None:
+            return web.Response(status=302, headers={"Location": f"{self.base_url}/auth/users/sign_in"})
+        return web.Response(status=302, headers={"Location": f"{self.base_url}/users/{ACCOUNT_ID}/devices"})
+
+    async def _devices(self, request):
+        session = self._session(request)
+        if session is None or request.match_info["account"] != ACCOUNT_ID:
+            return web.Response(status=302, headers={"Location": f"{self.base_url}/auth/users/sign_in"})
+        if "application/json" in request.headers.get("Accept", ""):
+            return web.json_response([{"device": device} for device in self.devices])
+        return web.Response(text=_page(self._issue_csrf(session)), content_type="text/html")
+
+    async def _post(self, request):
+        session = self._session(request)
+        if session is None:
+            return web.Response(status=302, headers={"Location": f"{self.base_url}/auth/users/sign_in"})
+        form = await request.post()
+        if form.get("authenticity_token") != self.csrf.get(session):
+            return web.Response(status=422, text="Invalid authenticity token")
+        if form.get("function[code]") == "0039":
+            asyncio.get_running_loop().call_later(self.fix_delay, self.report_fix, request.match_info["uuid"])
+        return web.json_response({"status": "ok"})
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/auth/users/sign_in", self._sign_in_page, name="sign_in_page")
+        app.router.add_post("/auth/users/sign_in", self._sign_in, name="sign_in")
+        app.router.add_get("/", self._root, name="root")
+        app.router.add_get("/users/{account}/devices", self._devices, name="devices")
+        app.router.add_post("/api/devices/{uuid}/functions", self._post, name="functions")
+        app.router.add_post("/devices/{uuid}/messages", self._post, name="messages")
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+@contextmanager
+def pointed_at(base_url: str):
+    """Temporarily point GpsClient at the stand-in instead of the portal."""
+    from custom_components.one2track.client import gps_client
+
+    original = dict(gps_client.CONFIG)
+    for key, value in original.items():
+        gps_client.CONFIG[key] = value.replace("https://www.one2trackgps.com", base_url)
+    try:
+        yield
+    finally:
+        gps_client.CONFIG.update(original)
+
+
+async def _serve(args) -> None:
+    server = StandInServer(args.devices, args.latency, args.error_rate, args.error_status)
+    base_url = await server.start(args.host, args.port)
+    print(f"Stand-in portal with {args.devices} devices at {base_url} "
+          f"(user {USERNAME!r}, password {PASSWORD!r}, account {ACCOUNT_ID})")
+    try:
+        while True:
+            await asyncio.sleep(args.tick)
+            server.advance(args.moving, args.tick)
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--moving", type=float, default=0.1, help="fraction of watches moving per tick")
+    parser.add_argument("--tick", type=int, default=60, help="seconds between simulated check-ins")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
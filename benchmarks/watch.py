@@ -0,0 +1,105 @@
+"""
+Simulated watches for the local watch gateway.
+
+Each watch keeps a TCP connection to the gateway open, like the real ones do,
+sends heartbeats (LK) and location reports (UD) and measures how long the
+gateway takes to acknowledge a heartbeat. The watch ids match the serial
+numbers of the stand-in portal's fleet, so both can run side by side:
+
+    python -m benchmarks.watch --port 5050 --watches 10 --interval 5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from custom_components.one2track.gateway import encode_frame
+
+
+def standin_watch_id(index: int) -> str:
+    """Watch id of the stand-in portal's device index; watches send the last 10 digits of their serial."""
+    return f"8600{index:08d}"[-10:]
+
+
+class SimulatedWatch:
+    def __init__(self, watch_id: str, vendor: str = "3G") -> None:
+        self.watch_id = watch_id
+        self.vendor = vendor
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self, host: str, port: int) -> None:
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+    async def _send(self, content: str) -> None:
+        self.writer.write(encode_frame(self.vendor, self.watch_id, content))
+        await self.writer.drain()
+
+    async def heartbeat(self, battery: int = 80) -> float:
+        """Send LK and return the seconds until the gateway acknowledged it."""
+        start = time.perf_counter()
+        await self._send(f"LK,0,0,{battery}")
+        await self.reader.readuntil(b"]")
+        return time.perf_counter() - start
+
+    async def report(self, latitude: float, longitude: float, speed: float = 0.0, battery: int = 80,
+                     satellites: int = 8, when: Optional[datetime] = None) -> None:
+        """Send a UD location report with a valid GPS fix."""
+        when = when or datetime.now(timezone.utc)
+        await self._send(
+            f"UD,{when:%d%m%y},{when:%H%M%S},A,"
+            f"{abs(latitude):.6f},{'N' if latitude >= 0 else 'S'},"
+            f"{abs(longitude):.6f},{'E' if longitude >= 0 else 'W'},"
+            f"{speed:.2f},0.0,2.0,{satellites},100,{battery},0,0,00000000"
+        )
+
+
+async def _run(args) -> None:
+    watches = [SimulatedWatch(standin_watch_id(index)) for index in range(args.watches)]
+    for watch in watches:
+        await watch.connect(args.host, args.port)
+
+    rng = random.Random(0)
+    positions = [(52.3 + rng.uniform(-0.1, 0.1), 4.9 + rng.uniform(-0.1, 0.1)) for _ in watches]
+    try:
+        while True:
+            round_trips: List[float] = []
+            for index, watch in enumerate(watches):
+                latitude, longitude = positions[index]
+                if rng.random() < args.moving:
+                    latitude += rng.uniform(-0.002, 0.002)
+                    longitude += rng.uniform(-0.002, 0.002)
+                    positions[index] = (latitude, longitude)
+                await watch.report(latitude, longitude, speed=5.0)
+                round_trips.append(await watch.heartbeat())
+            print(f"{len(watches)} watches reported, heartbeat ack mean "
+                  f"{statistics.mean(round_trips) * 1000:.2f} ms, max {max(round_trips) * 1000:.2f} ms")
+            await asyncio.sleep(args.interval)
+    finally:
+        for watch in watches:
+            await watch.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--watches", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between report rounds")
+    parser.add_argument("--moving", type=float, default=0.1, help="fraction of watches moving per round")
+    try:
+        asyncio.run(_run(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
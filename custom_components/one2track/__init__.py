@@ -1,23 +1,68 @@
 import asyncio
+import time
+from dataclasses import replace
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
 from requests import ConnectTimeout, HTTPError
+from homeassistant.components.zone import ATTR_RADIUS, DOMAIN as ZONE_DOMAIN
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import ATTR_LATITUDE, ATTR_LONGITUDE
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from datetime import timedelta
-from .client import get_client, One2TrackConfig
+from .backoff import CircuitBreaker
+from .burst import BurstPoller
+from .client import ClientMetrics, Device, One2TrackConfig, TransientError
 from .common import (
     CONF_USER_NAME,
     CONF_PASSWORD,
     CONF_ID,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_FILTER_JITTER,
+    CONF_COLLECT_METRICS,
+    CONF_PUSH_PORT,
     DOMAIN,
+    EVENT_ZONE,
     LOGGER,
-    DEFAULT_UPDATE_RATE_SEC
+    SIGNAL_DEVICE_UPDATE,
+    DEFAULT_UPDATE_RATE_SEC,
+    DEFAULT_MIN_UPDATE_RATE_SEC,
+    DEFAULT_MAX_UPDATE_RATE_SEC
 )
+from .filters import JitterFilter
+from .gateway import PUSH_STALE_SEC, WatchGateway
+from .geofence import GeofenceEngine, Zone
+from .history import FleetHistory
+from .hub import One2TrackHub, async_get_hub
+from .scheduler import AdaptivePollScheduler
+from .snapshot import build_snapshot
+from .services import async_setup_services
+from .storage import One2TrackStore
 
 PLATFORMS = ["device_tracker", "sensor", "button"]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+# Fields that can move a device in or out of a zone
+LOCATION_FIELDS = frozenset({"latitude", "longitude", "accuracy"})
+# Successive refreshes a device must be missing from before it is removed
+REMOVE_AFTER_MISSES = 3
+
 class GpsCoordinator(DataUpdateCoordinator):
-    def __init__(self, hass, api_client):
+    def __init__(
+        self,
+        hass,
+        api_client,
+        store: One2TrackStore = None,
+        scheduler: AdaptivePollScheduler = None,
+        hub: One2TrackHub = None,
+        jitter_filter: JitterFilter = None,
+    ):
         super().__init__(
             hass,
             LOGGER,
@@ -25,12 +70,232 @@ class GpsCoordinator(DataUpdateCoordinator):
             update_interval=timedelta(seconds=DEFAULT_UPDATE_RATE_SEC),
         )
         self.api_client = api_client
+        self.store = store
+        self.scheduler = scheduler
+        self.hub = hub
+        self.jitter_filter = jitter_filter
+        # Changed fields per device uuid, between the previous and current snapshot
+        self.changes: Dict[str, FrozenSet[str]] = {}
+        self.history = FleetHistory()
+        self.geofence = GeofenceEngine()
+        self.breaker = CircuitBreaker()
+        self.burst = BurstPoller(self)
+        self._dispatched_success = True
+        # When each device uuid last reported through the local gateway
+        self.push_seen: Dict[str, float] = {}
+        # Successive refreshes each device uuid has been missing from
+        self._missing: Dict[str, int] = {}
+        self._watch_index: Tuple[Optional[Mapping[str, Device]], Dict[str, str]] = (None, {})
 
     async def _async_update_data(self):
+        self.changes = {}
+        if self._all_pushing():
+            # Every watch reports to the local gateway, the portal has nothing newer
+            return self.data
+
+        if not self.breaker.allow_request():
+            # Don't hammer the portal during an outage, not even for on-demand refreshes
+            raise UpdateFailed(f"Portal unavailable, retrying in {self.breaker.retry_in:.0f}s")
+
+        if self.hub is not None:
+            await self.hub.async_wait_for_slot(self.api_client.config.id)
+
         try:
-            return await self.api_client.update()
+            devices = await self.api_client.update()
+            if devices is None:
+                raise TransientError("No device data received")
         except Exception as err:
+            delay = self.breaker.record_failure(err)
+            self.update_interval = timedelta(seconds=delay)
+            LOGGER.debug("Update failed (%s), next attempt in %.0fs", self.breaker.last_failure, delay)
             raise UpdateFailed(f"Error fetching data: {err}")
+        finally:
+            if self.store is not None:
+                self.store.async_update_session(self.api_client.cookie, self.api_client.account_id)
+
+        self.breaker.record_success()
+
+        if self.jitter_filter is not None:
+            devices = self.jitter_filter.apply(devices)
+
+        if self.push_seen:
+            # The gateway is ahead of the portal for watches that report to it
+            stale = time.monotonic() - PUSH_STALE_SEC
+            devices = [
+                replace(device, last_location=self.data[device.uuid].last_location)
+                if self.push_seen.get(device.uuid, 0) > stale and device.uuid in self.data else device
+                for device in devices
+            ]
+
+        if self.scheduler is not None:
+            # Burst polls come on top of the normal rhythm, don't let them back it off
+            self.update_interval = self.scheduler.next_interval(devices, count_idle=not self.burst.pending)
+        else:
+            self.update_interval = timedelta(seconds=DEFAULT_UPDATE_RATE_SEC)
+
+        return self._publish(devices)
+
+    def _publish(self, devices: Iterable[Device]) -> Mapping[str, Device]:
+        # Immutable snapshot indexed by uuid, built once per refresh so
+        # entities can resolve their device without scanning the list.
+        previous = self.data or {}
+        devices = list(devices)
+        devices.extend(self._carry_missing(previous, devices))
+        snapshot, self.changes = build_snapshot(previous, devices)
+        removed = [previous[uuid] for uuid in previous.keys() - snapshot.keys()]
+        if removed:
+            self._async_remove_devices(removed, snapshot)
+        self.history.record(snapshot.values())
+        self._fire_zone_events(snapshot)
+        if self.store is not None:
+            self.store.async_update_snapshot(snapshot, any(self.changes.values()))
+        return snapshot
+
+    def _carry_missing(self, previous: Mapping[str, Device], devices: List[Device]) -> List[Device]:
+        """
+        Previous records of devices missing from this refresh that shouldn't be removed yet.
+
+        A single response leaving out a device, or all of them, is more likely a
+        portal hiccup than the watch leaving the account; only a device missing
+        from REMOVE_AFTER_MISSES refreshes in a row is removed.
+        """
+        seen = {device.uuid for device in devices}
+        for uuid in seen:
+            self._missing.pop(uuid, None)
+        if not seen:
+            return list(previous.values())
+
+        carried = []
+        for uuid in previous.keys() - seen:
+            misses = self._missing[uuid] = self._missing.get(uuid, 0) + 1
+            if misses < REMOVE_AFTER_MISSES:
+                carried.append(previous[uuid])
+            else:
+                del self._missing[uuid]
+        return carried
+
+    @callback
+    def async_restore(self, devices: List[Device]) -> None:
+        """Publish a stored snapshot, so entities can be set up before the first live refresh."""
+        snapshot, _ = build_snapshot(None, devices)
+        self.data = snapshot
+        self.history.record(snapshot.values())
+
+    def _all_pushing(self) -> bool:
+        if not self.data or not self.push_seen:
+            return False
+        stale = time.monotonic() - PUSH_STALE_SEC
+        return all(self.push_seen.get(uuid, 0) > stale for uuid in self.data)
+
+    def _uuid_for_watch(self, watch_id: str) -> Optional[str]:
+        """Match a watch id to a device by serial number; watches may only send its last digits."""
+        snapshot, index = self._watch_index
+        if snapshot is not self.data:
+            index = {}
+            for device in (self.data or {}).values():
+                if device.serial_number:
+                    index.setdefault(device.serial_number[-10:], device.uuid)
+                    index[device.serial_number] = device.uuid
+            self._watch_index = (self.data, index)
+        return index.get(watch_id)
+
+    @callback
+    def async_push_report(self, watch_id: str, fields: Dict[str, Any]) -> bool:
+        """Apply a report that came in through the local gateway, returning whether the watch is known."""
+        uuid = self._uuid_for_watch(watch_id)
+        if uuid is None:
+            return False
+
+        self.push_seen[uuid] = time.monotonic()
+        device = self.data[uuid]
+        pushed = replace(device, last_location=replace(device.last_location, **fields))
+        self.data = self._publish(pushed if other.uuid == uuid else other for other in self.data.values())
+        self.async_update_listeners()
+        return True
+
+    @callback
+    def async_dispatch_device_updates(self) -> None:
+        """
+        Signal the entities of each device whose record changed.
+
+        Registered as the coordinator's own listener, which also keeps the
+        polling going. When availability flips every device is signalled.
+        """
+        if self.last_update_success != self._dispatched_success:
+            self._dispatched_success = self.last_update_success
+            uuids = list((self.data or {}).keys())
+        else:
+            uuids = [uuid for uuid, fields in self.changes.items() if fields]
+        for uuid in uuids:
+            async_dispatcher_send(self.hass, SIGNAL_DEVICE_UPDATE.format(uuid))
+
+    @callback
+    def _async_remove_devices(self, removed: List[Device], snapshot) -> None:
+        """
+        Forget devices that left the account.
+
+        Their entities are removed from the entity registry, and the device is
+        detached from the config entry unless another watch shares its name.
+        The platforms add entities for new devices themselves.
+        """
+        device_registry = dr.async_get(self.hass)
+        entity_registry = er.async_get(self.hass)
+        remaining_names = {device.name for device in snapshot.values()}
+        entries = [] if self.config_entry is None else er.async_entries_for_config_entry(
+            entity_registry, self.config_entry.entry_id
+        )
+        for device in removed:
+            LOGGER.info("Device %s is no longer in the account, removing it", device.name)
+            self.history.remove(device.uuid)
+            self.geofence.remove(device.uuid)
+            self.push_seen.pop(device.uuid, None)
+            # Unique ids of device entities all contain the uuid
+            for entity_entry in entries:
+                if device.uuid in entity_entry.unique_id:
+                    entity_registry.async_remove(entity_entry.entity_id)
+            # Devices are registered by name, another watch may still use it
+            if self.config_entry is None or device.name in remaining_names:
+                continue
+            entry = device_registry.async_get_device(identifiers={(DOMAIN, device.name)})
+            if entry is not None:
+                device_registry.async_update_device(entry.id, remove_config_entry_id=self.config_entry.entry_id)
+
+    def _fire_zone_events(self, snapshot) -> None:
+        zones_changed = self.geofence.set_zones(
+            Zone(state.entity_id, state.attributes[ATTR_LATITUDE], state.attributes[ATTR_LONGITUDE],
+                 state.attributes.get(ATTR_RADIUS, 0))
+            for state in self.hass.states.async_all(ZONE_DOMAIN)
+            if ATTR_LATITUDE in state.attributes and ATTR_LONGITUDE in state.attributes
+        )
+        devices = snapshot.values()
+        if not zones_changed:
+            devices = [device for device in devices if self.has_changed(device.uuid, LOCATION_FIELDS)]
+
+        for uuid, zone, event in self.geofence.update(devices):
+            self.hass.bus.async_fire(EVENT_ZONE, {
+                "device_uuid": uuid,
+                "device_name": snapshot[uuid].name,
+                "zone": zone,
+                "event": event,
+            })
+
+    def get_device(self, uuid: str) -> Optional[Device]:
+        """Return the device record for uuid from the current snapshot."""
+        if not self.data:
+            return None
+        return self.data.get(uuid)
+
+    def has_changed(self, uuid: str, fields: Iterable[str]) -> bool:
+        """Return whether any of fields changed for uuid in the last refresh."""
+        changes = self.changes.get(uuid)
+        if changes is None:
+            return uuid not in (self.data or {})
+        return not changes.isdisjoint(fields)
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    async_get_hub(hass)
+    async_setup_services(hass)
+    return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     config = One2TrackConfig(
@@ -38,17 +303,60 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         password=entry.data[CONF_PASSWORD],
         id=entry.data[CONF_ID]
     )
-    api = get_client(config)
+    min_interval = entry.options.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_RATE_SEC)
+    hub = async_get_hub(hass)
+    api = hub.create_client(config, min_interval)
+    if entry.options.get(CONF_COLLECT_METRICS):
+        api.metrics = ClientMetrics()
+
+    # Skip the login round trips when the last session is still around
+    store = One2TrackStore(hass, entry.data[CONF_ID])
+    await store.async_load()
+    if store.session_cookie:
+        api.restore_session(store.session_cookie, store.account_id)
+
+    scheduler = AdaptivePollScheduler(
+        min_interval,
+        entry.options.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_RATE_SEC),
+    )
+    jitter_filter = JitterFilter() if entry.options.get(CONF_FILTER_JITTER, False) else None
+    coordinator = GpsCoordinator(hass, api, store, scheduler, hub, jitter_filter)
 
-    coordinator = GpsCoordinator(hass, api)
-    await coordinator.async_refresh()
+    # Start from the last known devices instead of waiting on the portal
+    restored = store.devices
+    if restored:
+        coordinator.async_restore(restored)
+    else:
+        await coordinator.async_config_entry_first_refresh()
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {"coordinator": coordinator}
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(coordinator.async_add_listener(coordinator.async_dispatch_device_updates))
+    if restored:
+        entry.async_create_background_task(hass, coordinator.async_refresh(), "one2track first refresh")
+
+    push_port = entry.options.get(CONF_PUSH_PORT, 0)
+    if push_port:
+        gateway = WatchGateway(coordinator.async_push_report)
+        try:
+            await gateway.async_start(push_port)
+        except OSError as err:
+            LOGGER.error("Could not listen for watch reports on port %s: %s", push_port, err)
+        else:
+            entry.async_on_unload(gateway.async_stop)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(coordinator.burst.cancel)
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        async_get_hub(hass).remove_client(entry.data[CONF_ID])
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await One2TrackStore(hass, entry.data[CONF_ID]).async_remove()
@@ -0,0 +1,78 @@
+import random
+import time
+from typing import Optional
+
+from .client import AuthenticationError, RateLimitedError
+
+# First retry delay per failure kind, doubled for every consecutive failure
+BACKOFF_SEC = {
+    "auth": 300,
+    "rate_limited": 60,
+    "transient": 30,
+}
+MAX_BACKOFF_SEC = 3600
+# Delays are spread by up to this fraction so accounts don't retry in lockstep
+JITTER = 0.2
+# Consecutive failures after which the circuit opens
+FAILURE_THRESHOLD = 3
+
+
+def classify(err: Exception) -> str:
+    """Tell expired or invalid credentials, rate limiting and transient failures apart."""
+    if isinstance(err, AuthenticationError):
+        return "auth"
+    if isinstance(err, RateLimitedError):
+        return "rate_limited"
+    return "transient"
+
+
+class CircuitBreaker:
+    """
+    Exponential backoff with jitter, plus a circuit breaker for outages.
+
+    Every failure doubles the delay until the next poll. Once FAILURE_THRESHOLD
+    failures happened in a row the circuit opens and any request, including
+    on-demand refreshes, is refused until the delay has passed. The next
+    request then probes the portal: success closes the circuit, failure opens
+    it again for longer.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, max_backoff: float = MAX_BACKOFF_SEC) -> None:
+        self.failure_threshold = failure_threshold
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.last_failure: Optional[str] = None
+        self.open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    @property
+    def retry_in(self) -> float:
+        return max(self.open_until - time.monotonic(), 0.0)
+
+    def allow_request(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.last_failure = None
+        self.open_until = 0.0
+
+    def record_failure(self, err: Exception) -> float:
+        """Register a failed request and return the seconds to wait before the next one."""
+        kind = classify(err)
+        self.failures += 1
+        self.last_failure = kind
+
+        delay = min(BACKOFF_SEC[kind] * 2 ** (self.failures - 1), self.max_backoff)
+        delay *= random.uniform(1 - JITTER, 1 + JITTER)
+        if isinstance(err, RateLimitedError) and err.retry_after:
+            delay = max(delay, err.retry_after)
+
+        if self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + delay
+        return delay
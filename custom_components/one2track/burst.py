@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from homeassistant.core import callback
+
+from .common import LOGGER
+
+# Delays between polls while waiting for a requested fix; the last one repeats
+BURST_DELAYS_SEC = (10, 10, 15, 20, 30)
+# Give up waiting for a fix after this long
+BURST_DEADLINE_SEC = 180
+
+
+class BurstPoller:
+    """
+    Poll on a short, growing schedule until requested fixes arrive.
+
+    A watch takes tens of seconds to report after a location request, so a
+    single refresh right after the command returns the old position. Instead
+    the account is polled until every watched device reports a newer
+    last_location_update or its deadline passes; the coordinator's normal
+    schedule resumes after that.
+    """
+
+    def __init__(self, coordinator) -> None:
+        self.coordinator = coordinator
+        # uuid -> (last_location_update when the fix was requested, deadline)
+        self.pending: Dict[str, Tuple[Optional[datetime], float]] = {}
+        self._step = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def async_request_fix(self, uuid: str) -> bool:
+        """Ask the watch for a fix and poll until it lands.
+
+        Returns False without sending anything if a fix for the device is
+        already on its way, so repeated presses cost a single command, and
+        when the portal didn't accept the request.
+        """
+        if uuid in self.pending:
+            LOGGER.debug("Already waiting for a fix from %s", uuid)
+            return False
+
+        # Mark the device before sending, so presses during the request coalesce too
+        self.watch(uuid)
+        try:
+            accepted = await self.coordinator.api_client.force_gps_update(uuid)
+        except Exception:
+            self.pending.pop(uuid, None)
+            raise
+        if not accepted:
+            LOGGER.warning("Location request for %s was not accepted", uuid)
+            self.pending.pop(uuid, None)
+            if not self.pending:
+                self.cancel()
+        return accepted
+
+    @callback
+    def watch(self, uuid: str) -> None:
+        """Start polling for a fix that was already requested."""
+        device = self.coordinator.get_device(uuid)
+        baseline = device.last_location.last_location_update if device is not None else None
+        self.pending[uuid] = (baseline, time.monotonic() + BURST_DEADLINE_SEC)
+        self._step = 0
+
+        if self._task is None or self._task.done():
+            self._task = self.coordinator.hass.async_create_background_task(
+                self._async_poll(), "one2track burst poll"
+            )
+
+    @callback
+    def cancel(self) -> None:
+        self.pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _landed(self, uuid: str, baseline: Optional[datetime]) -> bool:
+        device = self.coordinator.get_device(uuid)
+        if device is None or device.last_location.last_location_update is None:
+            return False
+        return baseline is None or device.last_location.last_location_update > baseline
+
+    async def _async_poll(self) -> None:
+        while self.pending:
+            await asyncio.sleep(BURST_DELAYS_SEC[min(self._step, len(BURST_DELAYS_SEC) - 1)])
+            self._step += 1
+            await self.coordinator.async_refresh()
+
+            now = time.monotonic()
+            for uuid, (baseline, deadline) in list(self.pending.items()):
+                if self._landed(uuid, baseline):
+                    LOGGER.debug("Fix from %s arrived", uuid)
+                    del self.pending[uuid]
+                elif now >= deadline:
+                    LOGGER.debug("Gave up waiting for a fix from %s", uuid)
+                    del self.pending[uuid]
@@ -1,6 +1,9 @@
+from aiohttp import ClientSession
+
 from .gps_client import GpsClient
-from .client_types import One2TrackConfig, AuthenticationError, TrackerDevice
+from .metrics import ClientMetrics
+from .client_types import One2TrackConfig, AuthenticationError, TransientError, RateLimitedError, TrackerDevice, Device, DeviceLocation, DeviceSimcard
 
 
-def get_client(config: One2TrackConfig) -> GpsClient:
-    return GpsClient(config)
+def get_client(config: One2TrackConfig, session: ClientSession = None) -> GpsClient:
+    return GpsClient(config, session)
@@ -1,4 +1,6 @@
-from typing import NamedTuple, TypedDict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, TypedDict
 
 
 class AuthenticationError(Exception):
@@ -7,6 +9,20 @@ class AuthenticationError(Exception):
     pass
 
 
+class TransientError(Exception):
+    """The portal could not be reached or failed with a server error; retrying later may work"""
+
+    pass
+
+
+class RateLimitedError(TransientError):
+    """The portal asked us to slow down"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class One2TrackConfig(NamedTuple):
     """
     This is our config for logging into One2Track
@@ -37,6 +53,7 @@ class Location(TypedDict):
     address: str
     latitude: float
     longitude: float
+    accuracy: float
     altitude: float
     location_type: str  # e.g. WIFI
     signal_strength: int
@@ -61,3 +78,146 @@ class TrackerDevice(TypedDict):
     uuid: str
     last_location: Location
     simcard: Simcard
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+_MISSING = object()
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceLocation:
+    """Parsed Location, with timestamps and numbers converted once per poll."""
+
+    id: Optional[int] = None
+    last_communication: Optional[datetime] = None
+    last_location_update: Optional[datetime] = None
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    accuracy: Optional[float] = None
+    altitude: Optional[float] = None
+    location_type: Optional[str] = None
+    signal_strength: Optional[int] = None
+    satellite_count: Optional[int] = None
+    speed: Optional[float] = None
+    battery_percentage: Optional[int] = None
+    host: Optional[str] = None
+    port: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, raw: Location) -> "DeviceLocation":
+        return cls(
+            id=raw.get("id"),
+            last_communication=_to_datetime(raw.get("last_communication")),
+            last_location_update=_to_datetime(raw.get("last_location_update")),
+            address=raw.get("address"),
+            latitude=_to_float(raw.get("latitude")),
+            longitude=_to_float(raw.get("longitude")),
+            accuracy=_to_float(raw.get("accuracy")),
+            altitude=_to_float(raw.get("altitude")),
+            location_type=raw.get("location_type"),
+            signal_strength=_to_int(raw.get("signal_strength")),
+            satellite_count=_to_int(raw.get("satellite_count")),
+            speed=_to_float(raw.get("speed")),
+            battery_percentage=_to_int(raw.get("battery_percentage")),
+            host=raw.get("host"),
+            port=_to_int(raw.get("port")),
+        )
+
+    def as_dict(self) -> Location:
+        return {name: _to_json(getattr(self, name)) for name in LOCATION_FIELDS}
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceSimcard:
+    balance_cents: Optional[float] = None
+    tariff_type: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, raw: Simcard) -> "DeviceSimcard":
+        return cls(
+            balance_cents=_to_float(raw.get("balance_cents")),
+            tariff_type=raw.get("tariff_type"),
+        )
+
+    def as_dict(self) -> Simcard:
+        return {name: getattr(self, name) for name in SIMCARD_FIELDS}
+
+
+@dataclass(frozen=True, slots=True)
+class Device:
+    """Parsed TrackerDevice, as published in the coordinator snapshot."""
+
+    uuid: str
+    id: Optional[int] = None
+    serial_number: Optional[str] = None
+    name: Optional[str] = None
+    phone_number: Optional[str] = None
+    status: Optional[str] = None
+    last_location: DeviceLocation = DeviceLocation()
+    simcard: DeviceSimcard = DeviceSimcard()
+
+    @classmethod
+    def from_dict(cls, raw: TrackerDevice) -> "Device":
+        return cls(
+            uuid=raw["uuid"],
+            id=raw.get("id"),
+            serial_number=raw.get("serial_number"),
+            name=raw.get("name"),
+            phone_number=raw.get("phone_number"),
+            status=raw.get("status"),
+            last_location=DeviceLocation.from_dict(raw.get("last_location") or {}),
+            simcard=DeviceSimcard.from_dict(raw.get("simcard") or {}),
+        )
+
+    def as_dict(self) -> TrackerDevice:
+        data = {name: getattr(self, name) for name in DEVICE_FIELDS}
+        data["last_location"] = self.last_location.as_dict()
+        data["simcard"] = self.simcard.as_dict()
+        return data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Look up a field by name in the location, the simcard or the device itself."""
+        for record in (self.last_location, self.simcard, self):
+            value = getattr(record, name, _MISSING)
+            if value is not _MISSING:
+                return default if value is None else value
+        return default
+
+    def flatten(self) -> Dict[str, Any]:
+        """All fields by name, resolved the same way as get()."""
+        values = {name: getattr(self, name) for name in DEVICE_FIELDS}
+        values.update((name, getattr(self.simcard, name)) for name in SIMCARD_FIELDS)
+        values.update((name, getattr(self.last_location, name)) for name in LOCATION_FIELDS)
+        return values
+
+
+LOCATION_FIELDS = tuple(field.name for field in fields(DeviceLocation))
+SIMCARD_FIELDS = tuple(field.name for field in fields(DeviceSimcard))
+DEVICE_FIELDS = tuple(field.name for field in fields(Device) if field.name not in ("last_location", "simcard"))
@@ -0,0 +1,88 @@
+import codecs
+import json
+import re
+from typing import List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ships with Home Assistant
+    orjson = None
+
+from .client_types import Device
+
+# Bodies up to this size are decoded in one go, larger or unsized ones are streamed
+STREAM_THRESHOLD = 256 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_devices(body: bytes) -> List[Device]:
+    """Decode a complete devices response."""
+    # Only the fields declared on Device are kept, everything else the portal
+    # sends along is dropped as soon as a device record is parsed.
+    return [Device.from_dict(item["device"]) for item in loads(body)]
+
+
+class DeviceStreamDecoder:
+    """
+    Incrementally decode a devices response, a JSON array of {"device": {...}}.
+
+    Each array item is parsed into a Device as soon as it is complete, so neither the full
+    text nor the full parsed tree is held in memory.
+    """
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._started = False
+        self._done = False
+        self.devices: List[Device] = []
+
+    def feed(self, chunk: bytes):
+        self._buffer += self._utf8.decode(chunk)
+        self._parse()
+
+    def _parse(self):
+        buffer = self._buffer
+        pos = 0
+
+        while not self._done:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+
+            char = buffer[pos]
+            if not self._started:
+                if char != "[":
+                    raise ValueError(f"Expected a JSON array, got {char!r}")
+                self._started = True
+                pos += 1
+            elif char == ",":
+                pos += 1
+            elif char == "]":
+                self._done = True
+                pos += 1
+            else:
+                try:
+                    item, end = self._json.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Item not complete yet, wait for more data
+                    break
+                self.devices.append(Device.from_dict(item["device"]))
+                pos = end
+
+        self._buffer = buffer[pos:]
+
+    def close(self) -> List[Device]:
+        self._buffer += self._utf8.decode(b"", final=True)
+        self._parse()
+        if not self._done or self._buffer.strip():
+            raise ValueError("Incomplete or trailing data in devices response")
+        return self.devices
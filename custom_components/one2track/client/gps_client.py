@@ -1,11 +1,17 @@
-import json
+import asyncio
 import logging
-from typing import List
-from aiohttp import ClientSession
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from aiohttp import ClientError, ClientSession, DummyCookieJar, TCPConnector
+from .decoder import STREAM_THRESHOLD, DeviceStreamDecoder, decode_devices
+from .metrics import ClientMetrics
+from .singleflight import SingleFlight
 from .client_types import (
-    TrackerDevice,
+    Device,
     One2TrackConfig,
-    AuthenticationError
+    AuthenticationError,
+    RateLimitedError,
+    TransientError
 )
 from ..common import (
     VERSION
@@ -22,44 +28,146 @@ CONFIG = {
     "session_cookie": "_iadmin"
 }
 
+# A CSRF token stays valid for the lifetime of the session cookie it was
+# issued with; the TTL only bounds how long we trust it without a rejection.
+CSRF_TTL_SEC = 30 * 60
+CSRF_MARKER = b'name="csrf-token" content="'
+CSRF_READ_CHUNK = 4096
+DEVICES_READ_CHUNK = 64 * 1024
+
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# A watch only shows the latest messages; don't flood it
+MESSAGE_MIN_INTERVAL_SEC = 10
+MESSAGE_SENT = "sent"
+MESSAGE_FAILED = "failed"
+MESSAGE_RATE_LIMITED = "rate_limited"
+
+# Connector settings used when no session is handed in (e.g. outside Home Assistant)
+CONNECTION_LIMIT = 10
+DNS_CACHE_TTL_SEC = 300
+KEEPALIVE_TIMEOUT_SEC = 75
+
+# Statuses the portal answers with when the session cookie is no longer accepted;
+# it bounces to the sign-in page, which itself returns 200
+SESSION_REJECTED_STATUSES = frozenset({301, 302, 303, 307, 308, 401, 403})
+
+def check_status(response, action: str) -> None:
+    """Raise the matching error when the portal is overloaded or failing."""
+    if response.status == 429:
+        retry_after = response.headers.get("Retry-After")
+        raise RateLimitedError(
+            f"{action}: rate limited",
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    if response.status >= 500:
+        raise TransientError(f"{action}: server error {response.status}")
+
+
 class GpsClient():
     config: One2TrackConfig
     cookie: str = ""
     csrf: str = ""
+    csrf_cookie: str = ""
+    csrf_expires: float = 0.0
     account_id: str
     session: ClientSession
+    # Request metrics, only collected when set
+    metrics: Optional[ClientMetrics] = None
 
     def __init__(self, config: One2TrackConfig, session: ClientSession = None):
         self.config = config
         self.account_id = config.id  # might be empty
         self.session = session
+        self.owns_session = False
+        # Concurrent updates, logins and CSRF fetches share one request
+        self._flights = SingleFlight()
+        # When each device uuid was last sent a message
+        self._messages_sent: Dict[str, float] = {}
 
     def set_account_id(self, account_id):
         self.account_id = account_id
 
     async def get_csrf(self):
-        login_page = await self.call_api(CONFIG["login_url"])
+        login_page = await self.call_api(CONFIG["login_url"], stream=True, endpoint="sign_in_page")
         if login_page.status == 200:
-            html = await login_page.text()
+            html = await self.read_csrf_head(login_page)
             self.csrf = self.parse_csrf(html)
-            _LOGGER.debug(f"[pre-login] Found this CSRF: {self.csrf}")
+            _LOGGER.debug("[pre-login] Found a CSRF token")
             self.cookie = self.parse_cookie(login_page)
-            _LOGGER.debug(f"[pre-login] Found this cookie: {self.cookie}")
+            _LOGGER.debug("[pre-login] Received a session cookie")
         else:
+            login_page.release()
             _LOGGER.warning(f"[pre-log] failed pre-login. response code: {login_page.status}")
+            check_status(login_page, "Login page")
             raise AuthenticationError("Login page unavailable")
 
-    async def get_csrf_nologin(self):
+    def has_valid_csrf(self) -> bool:
+        return (
+            bool(self.csrf)
+            and self.csrf_cookie == self.cookie
+            and time.monotonic() < self.csrf_expires
+        )
+
+    async def get_csrf_nologin(self, force=False):
+        if not force and self.has_valid_csrf():
+            _LOGGER.debug("[nologin] Reusing cached CSRF")
+            return
+
+        # A forced refresh can share a fetch that is already running, it yields a fresh token too
+        await self._flights.run("csrf", self._fetch_csrf)
+
+    async def _fetch_csrf(self):
         url = CONFIG["device_url"].replace("%account%", self.account_id)
-        page = await self.call_api(url)
+        page = await self.call_api(url, stream=True, endpoint="devices_page")
+        if self.metrics is not None:
+            self.metrics.csrf_fetches += 1
         if page.status == 200:
-            html = await page.text()
+            html = await self.read_csrf_head(page)
             self.csrf = self.parse_csrf(html)
-            _LOGGER.debug(f"[nologin] Found this CSRF: {self.csrf}")
+            self.csrf_cookie = self.cookie
+            self.csrf_expires = time.monotonic() + CSRF_TTL_SEC
+            _LOGGER.debug("[nologin] Found a CSRF token")
         else:
+            page.release()
             _LOGGER.warning(f"[nologin] failed to retrieve csrf. response code: {page.status}")
 
-    async def call_api(self, url: str, data=None, allow_redirects=True, use_json=False):
+    async def read_csrf_head(self, response) -> str:
+        """Read a page only until its csrf-token meta tag has been received."""
+        buffer = bytearray()
+        try:
+            async for chunk in response.content.iter_chunked(CSRF_READ_CHUNK):
+                buffer += chunk
+                start = buffer.find(CSRF_MARKER)
+                if start != -1 and buffer.find(b'"', start + len(CSRF_MARKER)) != -1:
+                    break
+            if response.content.is_eof():
+                # The rest already arrived and the connection went back to the pool;
+                # drain it so a transport paused by the full buffer resumes reading.
+                await response.content.read()
+        finally:
+            response.release()
+        return buffer.decode("utf-8", errors="replace")
+
+    def create_session(self) -> ClientSession:
+        """Create a keep-alive session for standalone use."""
+        connector = TCPConnector(
+            limit=CONNECTION_LIMIT,
+            ttl_dns_cache=DNS_CACHE_TTL_SEC,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SEC,
+        )
+        # The session cookie is sent explicitly with every request
+        return ClientSession(connector=connector, cookie_jar=DummyCookieJar())
+
+    async def call_api(self, url: str, data=None, allow_redirects=True, use_json=False, stream=False,
+                       endpoint: str = "other"):
+        """Perform a request and return the response.
+
+        The body is read and the connection released back to the pool before
+        returning, unless stream is set; the caller must then release it.
+        With metrics enabled the request is recorded under endpoint, timed up
+        to the point it is returned.
+        """
         headers = {}
         cookies = {'accepted_cookies': 'true'}
 
@@ -73,21 +181,42 @@ class GpsClient():
         if self.cookie:
             cookies['_iadmin'] = self.cookie
 
-        _LOGGER.debug('[http] %s %s %s', url, headers, cookies)
+        # Never log the cookies, they grant access to the account
+        _LOGGER.debug('[http] %s %s', url, headers)
 
         if self.session is None:
-            self.session = ClientSession()
-            self.session.cookie_jar.clear()
+            self.session = self.create_session()
+            self.owns_session = True
 
-        if data is not None:
-            return await self.session.post(url,
-                                         data=data,
-                                         headers=headers,
-                                         allow_redirects=allow_redirects,
-                                         cookies=cookies
-                                         )
-        else:
-            return await self.session.get(url, headers=headers, allow_redirects=allow_redirects, cookies=cookies)
+        metrics = self.metrics
+        start = time.monotonic() if metrics is not None else 0.0
+        try:
+            if data is not None:
+                response = await self.session.post(url,
+                                                   data=data,
+                                                   headers=headers,
+                                                   allow_redirects=allow_redirects,
+                                                   cookies=cookies
+                                                   )
+            else:
+                response = await self.session.get(url, headers=headers, allow_redirects=allow_redirects, cookies=cookies)
+        except (ClientError, asyncio.TimeoutError) as err:
+            if metrics is not None:
+                metrics.record(endpoint, None, (time.monotonic() - start) * 1000)
+            raise TransientError(f"Cannot reach {endpoint}: {err!r}") from err
+
+        if stream:
+            if metrics is not None:
+                metrics.record(endpoint, response.status, (time.monotonic() - start) * 1000, response.content_length)
+            return response
+
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+        if metrics is not None:
+            metrics.record(endpoint, response.status, (time.monotonic() - start) * 1000, len(body))
+        return response
 
     def parse_cookie(self, response) -> str:
         cookie = ""
@@ -97,7 +226,7 @@ class GpsClient():
             return response.headers['Set-Cookie'].split(CONFIG["session_cookie"])[1].split(";")[
                 0].replace("=", "")
         else:
-            _LOGGER.warning(f"No new cookie found {self.cookie} was the old cookie")
+            _LOGGER.warning("No new session cookie found")
             return ""
 
     def parse_csrf(self, html) -> str:
@@ -112,20 +241,23 @@ class GpsClient():
             "user[remember_me]": "1",
         }
 
-        response = await self.call_api(CONFIG["login_url"], data=login_data, allow_redirects=False)
+        response = await self.call_api(CONFIG["login_url"], data=login_data, allow_redirects=False, endpoint="sign_in")
         _LOGGER.debug("[login] Status: %s", response.status)
 
         if response.status == 302 and "Set-Cookie" in response.headers:
             _LOGGER.debug("[login] login success!")
             self.cookie = self.parse_cookie(response)
-            _LOGGER.debug(f"[login] Found this cookie: {self.cookie}")
+            if self.metrics is not None:
+                self.metrics.logins += 1
             _LOGGER.debug(f"[login] Found this redirect: {response.headers['Location']}")
         else:
             _LOGGER.warning(f"[gps] failed to login. response code: {response.status}")
+            check_status(response, "Login")
             raise AuthenticationError("Invalid username or password")
 
     async def get_user_id(self):
-        response = await self.call_api(CONFIG["base_url"], allow_redirects=False)
+        response = await self.call_api(CONFIG["base_url"], allow_redirects=False, endpoint="root")
+        check_status(response, "Account lookup")
         url = response.headers['Location']
         account_id = url.split('/')[4]
         _LOGGER.debug(f'[install] extracted {account_id} from {url}')
@@ -133,21 +265,48 @@ class GpsClient():
         return account_id
 
     async def install(self):
+        return await self._flights.run("login", self._login)
+
+    async def _login(self):
         await self.get_csrf()
         await self.login()
-        id = await self.get_user_id()
-        return id
+        return await self.get_user_id()
+
+    def restore_session(self, cookie: str, account_id: str = None):
+        """Reuse a previously authenticated session instead of logging in."""
+        self.cookie = cookie
+        if account_id:
+            self.set_account_id(account_id)
+
+    async def update(self) -> List[Device]:
+        """Fetch all devices, logging in when needed. Concurrent calls share one update."""
+        return await self._flights.run("update", self._timed_update)
+
+    async def _timed_update(self) -> List[Device]:
+        if self.metrics is None:
+            return await self._update()
 
-    async def update(self) -> List[TrackerDevice]:
+        self.metrics.start_update()
+        try:
+            return await self._update()
+        finally:
+            self.metrics.finish_update()
+
+    async def _update(self) -> List[Device]:
         if self.cookie:
-            _LOGGER.debug("already logged in, continue... %s", self.cookie)
-            _LOGGER.debug("TEST123")
+            _LOGGER.debug("already logged in, continue...")
             _LOGGER.debug("Version: %s", VERSION)
-        else:
-            _LOGGER.debug("renew login")
-            await self.get_csrf()
-            await self.login()
-            await self.get_user_id()
+            try:
+                return await self.get_device_data()
+            except AuthenticationError:
+                _LOGGER.debug("session rejected, logging in again")
+                if self.metrics is not None:
+                    self.metrics.relogins += 1
+                self.cookie = ""
+                self.csrf = ""
+
+        _LOGGER.debug("renew login")
+        await self.install()
 
         try:
             devices = await self.get_device_data()
@@ -156,29 +315,44 @@ class GpsClient():
             _LOGGER.warning("login failed")
             self.cookie = ""
             self.csrf = ""
+            raise
 
     async def get_device_data(self):
         url = CONFIG["device_url"].replace("%account%", self.account_id)
-        response = await self.call_api(url, use_json=True)
-        rawjson = await response.text()
+        response = await self.call_api(url, allow_redirects=False, use_json=True, stream=True, endpoint="devices")
+
+        try:
+            if response.status in SESSION_REJECTED_STATUSES:
+                # The session cookie is no longer accepted and we get bounced to sign in
+                raise AuthenticationError(f"Session rejected with status {response.status}")
+
+            if response.status != 200:
+                # Keep the session: a failing portal says nothing about our cookie
+                _LOGGER.error("[one2track][error][update] Cant get devices updated: code: %s", response.status)
+                check_status(response, "Devices")
+                raise TransientError(f"Devices: unexpected status {response.status}")
 
-        if response.status == 200:
             try:
-                devices = json.loads(rawjson)
-                return list(map(lambda x: x['device'], devices))
+                return await self.read_devices(response)
             except Exception as e:
-                _LOGGER.error("[one2track][error][update] Cannot parse JSON: %s | %s", rawjson, e)
+                _LOGGER.error("[one2track][error][update] Cannot parse JSON (%s bytes): %s",
+                              response.content_length, e)
                 return None
-        else:
-            _LOGGER.error(f"[one2track][error][update] Cant get devices updated: code: %s message: %s", response.status,
-                         rawjson)
-            self.cookie = ""
-            self.csrf = ""
-            return []
+        finally:
+            response.release()
+
+    async def read_devices(self, response):
+        """Decode the devices response from raw bytes, streaming large fleets."""
+        if response.content_length is not None and response.content_length <= STREAM_THRESHOLD:
+            return decode_devices(await response.read())
+
+        decoder = DeviceStreamDecoder()
+        async for chunk in response.content.iter_chunked(DEVICES_READ_CHUNK):
+            decoder.feed(chunk)
+        return decoder.close()
 
     async def set_device_refresh_location(self, uuid):
-        await self.send_device_command(uuid, "0039")
-        return True
+        return await self.send_device_command(uuid, "0039")
 
     async def force_gps_update(self, uuid: str):
         """Explicit alias for sending the '0039' force GPS update command."""
@@ -188,12 +362,45 @@ class GpsClient():
         """Send the '0048' command to power off the device."""
         return await self.send_device_command(uuid, "0048")
 
-    async def send_device_command(self, uuid, cmd_code, cmd_value=None, cmd_value_param=None):
+    async def post_with_csrf(self, url, post_data, endpoint: str = "other"):
+        """POST form data using the cached CSRF token.
+
+        A rejected token is refreshed once. Redirects are not followed: an
+        expired session bounces to the sign-in page, so we log in again and
+        retry once, raising AuthenticationError if it is still rejected.
+        """
+        cookie = self.cookie
+        response = await self._post_with_csrf(url, post_data, endpoint)
+        if response.status not in SESSION_REJECTED_STATUSES:
+            return response
+
+        _LOGGER.debug("[csrf] session rejected with status %s, logging in again", response.status)
+        # Concurrent posts share the login; one that lost the race reuses the new session
+        if self.cookie == cookie:
+            if self.metrics is not None:
+                self.metrics.relogins += 1
+            await self.install()
+        response = await self._post_with_csrf(url, post_data, endpoint)
+        if response.status in SESSION_REJECTED_STATUSES:
+            raise AuthenticationError(f"Session rejected with status {response.status} after logging in again")
+        return response
+
+    async def _post_with_csrf(self, url, post_data, endpoint: str):
         await self.get_csrf_nologin()
 
+        post_data["authenticity_token"] = self.csrf
+        response = await self.call_api(url, post_data, allow_redirects=False, endpoint=endpoint)
+        if response.status == 422:
+            _LOGGER.debug("[csrf] token rejected, fetching a new one")
+            await self.get_csrf_nologin(force=True)
+            post_data["authenticity_token"] = self.csrf
+            response = await self.call_api(url, post_data, allow_redirects=False, endpoint=endpoint)
+
+        return response
+
+    async def send_device_command(self, uuid, cmd_code, cmd_value=None, cmd_value_param=None):
         post_data = {
             "function[code]": cmd_code,
-            "authenticity_token": self.csrf,
         }
 
         if(cmd_value):
@@ -206,29 +413,108 @@ class GpsClient():
         _LOGGER.debug("[send_device_command] url: %s", url)
         _LOGGER.debug("[send_device_command] post_data: %s", post_data)
 
-        response = await self.call_api(url, post_data)
+        response = await self.post_with_csrf(url, post_data, endpoint="functions")
         rawjson = await response.text()
         _LOGGER.debug("[send_device_command] response raw json: %s %s", response.status, rawjson)
 
-        return True
+        return 200 <= response.status < 300
+
+    async def send_device_commands(
+        self,
+        commands: Iterable[Tuple[str, str, Optional[str]]],
+        cmd_value_param=None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> Dict[str, bool]:
+        """Send (uuid, cmd_code, cmd_value) commands concurrently.
+
+        All commands share this client's session and a single CSRF token,
+        fetched up front. Returns whether each device accepted its command.
+        Each uuid may only appear once, the device handles one command at a time.
+        """
+        commands = list(commands)
+        by_uuid = {uuid: (cmd_code, cmd_value) for uuid, cmd_code, cmd_value in commands}
+        if len(by_uuid) != len(commands):
+            raise ValueError("send_device_commands takes one command per device")
+        commands = by_uuid
+
+        async def _send(uuid):
+            cmd_code, cmd_value = commands[uuid]
+            return await self.send_device_command(uuid, cmd_code, cmd_value, cmd_value_param)
+
+        return await self._send_batch(commands, _send, concurrency)
+
+    async def _send_batch(
+        self, uuids: Iterable[str], send: Callable[[str], Awaitable[bool]], concurrency: int
+    ) -> Dict[str, bool]:
+        """Run send(uuid) for every uuid, at most concurrency at a time, over one CSRF token."""
+        uuids = list(uuids)
+        if not uuids:
+            return {}
 
-    async def send_device_message(self, uuid, message):
         await self.get_csrf_nologin()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _send(uuid):
+            async with semaphore:
+                try:
+                    return await send(uuid)
+                except Exception as err:
+                    _LOGGER.warning("[send_batch] failed for %s: %s", uuid, err)
+                    return False
 
+        results = await asyncio.gather(*(_send(uuid) for uuid in uuids))
+        return dict(zip(uuids, results))
+
+    async def send_device_message(self, uuid, message):
         post_data = {
             "device_message[message]": message,
-            "authenticity_token": self.csrf,
         }
 
         url = CONFIG["message_url"].replace("%uuid%", uuid)
         _LOGGER.debug("[send_device_command] url: %s", url)
         _LOGGER.debug("[send_device_command] post_data: %s", post_data)
 
-        response = await self.call_api(url, post_data)
+        response = await self.post_with_csrf(url, post_data, endpoint="messages")
         rawjson = await response.text()
         _LOGGER.debug("[send_device_command] response raw json: %s %s", response.status, rawjson)
 
-        return True
+        # post_with_csrf doesn't follow redirects, so this is the portal's own answer
+        if 200 <= response.status < 300:
+            self._messages_sent[uuid] = time.monotonic()
+            return True
+        return False
+
+    async def send_device_messages(
+        self,
+        uuids: Iterable[str],
+        message: str,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> Dict[str, str]:
+        """Send message to every device concurrently, sharing one session and CSRF token.
+
+        A device that got a message less than MESSAGE_MIN_INTERVAL_SEC ago is
+        skipped. Returns MESSAGE_SENT, MESSAGE_FAILED or MESSAGE_RATE_LIMITED
+        per device.
+        """
+        now = time.monotonic()
+        results = {}
+        allowed = []
+        for uuid in dict.fromkeys(uuids):
+            if self._messages_sent.get(uuid, float("-inf")) > now - MESSAGE_MIN_INTERVAL_SEC:
+                results[uuid] = MESSAGE_RATE_LIMITED
+            else:
+                # Claim the slot now, so an overlapping call doesn't send too
+                self._messages_sent[uuid] = now
+                allowed.append(uuid)
+
+        sent = await self._send_batch(allowed, lambda uuid: self.send_device_message(uuid, message), concurrency)
+        for uuid, ok in sent.items():
+            results[uuid] = MESSAGE_SENT if ok else MESSAGE_FAILED
+            if not ok:
+                self._messages_sent.pop(uuid, None)
+        return results
 
     async def close(self):
-        await self.session.close()
+        """Close the session, unless it was handed in by the caller."""
+        if self.owns_session and self.session is not None:
+            await self.session.close()
@@ -0,0 +1,114 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Optional
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class EndpointMetrics:
+    """Counters and a latency histogram for one portal endpoint."""
+
+    __slots__ = ("requests", "errors", "bytes", "total_ms", "max_ms", "statuses", "buckets")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.statuses: Counter = Counter()
+        # One extra bucket for everything slower than the last bound
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, status: Optional[int], elapsed_ms: float, size: Optional[int]) -> None:
+        self.requests += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if status is None or status >= 400:
+            self.errors += 1
+        if status is not None:
+            self.statuses[status] += 1
+        if size:
+            self.bytes += size
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "mean_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+            "max_ms": round(self.max_ms, 1),
+            "statuses": dict(self.statuses),
+            "latency": dict(zip(labels, self.buckets)),
+        }
+
+
+class ClientMetrics:
+    """
+    Request metrics for a GpsClient.
+
+    Latency is measured until the response headers arrive; streamed bodies
+    count their Content-Length. Each update() cycle also gets a per-endpoint
+    breakdown of where its time went.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+        self.logins = 0
+        self.relogins = 0
+        self.csrf_fetches = 0
+        self.updates = 0
+        self.last_update_ms: Optional[float] = None
+        self.last_update_breakdown: Dict[str, float] = {}
+        self._cycle: Optional[Dict[str, float]] = None
+        self._cycle_start = 0.0
+
+    def record(self, endpoint: str, status: Optional[int], elapsed_ms: float, size: Optional[int] = None) -> None:
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        metrics.record(status, elapsed_ms, size)
+        if self._cycle is not None:
+            self._cycle[endpoint] = self._cycle.get(endpoint, 0.0) + elapsed_ms
+
+    def start_update(self) -> None:
+        self._cycle = {}
+        self._cycle_start = time.monotonic()
+
+    def finish_update(self) -> None:
+        if self._cycle is None:
+            return
+        self.updates += 1
+        self.last_update_ms = (time.monotonic() - self._cycle_start) * 1000
+        self.last_update_breakdown = {endpoint: round(ms, 1) for endpoint, ms in self._cycle.items()}
+        self._cycle = None
+
+    @property
+    def requests(self) -> int:
+        return sum(metrics.requests for metrics in self.endpoints.values())
+
+    @property
+    def errors(self) -> int:
+        return sum(metrics.errors for metrics in self.endpoints.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(metrics.bytes for metrics in self.endpoints.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "logins": self.logins,
+            "relogins": self.relogins,
+            "csrf_fetches": self.csrf_fetches,
+            "updates": self.updates,
+            "last_update_ms": round(self.last_update_ms, 1) if self.last_update_ms is not None else None,
+            "last_update_breakdown": self.last_update_breakdown,
+            "endpoints": {endpoint: metrics.as_dict() for endpoint, metrics in self.endpoints.items()},
+        }
@@ -5,11 +5,30 @@ VERSION = "1.2.6"
 DOMAIN = "one2track"
 DEFAULT_PREFIX = "one2track"
 DEFAULT_UPDATE_RATE_SEC = 60
+DEFAULT_MIN_UPDATE_RATE_SEC = 30
+DEFAULT_MAX_UPDATE_RATE_SEC = 900
 CHECK_TIME_DELTA = timedelta(hours=0, minutes=30)
 
+# Fired when a device enters or leaves a zone
+EVENT_ZONE = f"{DOMAIN}_zone"
+# Dispatcher signal sent when one device's record changed, formatted with its uuid
+SIGNAL_DEVICE_UPDATE = f"{DOMAIN}_device_update_{{}}"
+
 # Config keys
 CONF_USER_NAME = "Username"
 CONF_PASSWORD = "Password"
 CONF_ID = "AccountID"
 
+# Option keys
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
+CONF_FILTER_JITTER = "filter_jitter"
+CONF_COMPACT_RECORDING = "compact_recording"
+CONF_COLLECT_METRICS = "collect_metrics"
+# TCP port of the local watch gateway, 0 to disable it
+CONF_PUSH_PORT = "push_port"
+
+# Rarely changing device fields, split off into diagnostic sensors in compact recording mode
+METADATA_FIELDS = ("serial_number", "phone_number", "tariff_type", "host", "port")
+
 LOGGER = logging.getLogger(__package__)
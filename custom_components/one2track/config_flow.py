@@ -1,12 +1,21 @@
-from typing import List
+from typing import Tuple
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 from .common import (
     DOMAIN,
     DEFAULT_PREFIX,
     CONF_USER_NAME,
     CONF_PASSWORD,
-    CONF_ID
+    CONF_ID,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_FILTER_JITTER,
+    CONF_COMPACT_RECORDING,
+    CONF_COLLECT_METRICS,
+    CONF_PUSH_PORT,
+    DEFAULT_MIN_UPDATE_RATE_SEC,
+    DEFAULT_MAX_UPDATE_RATE_SEC
 )
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
@@ -14,20 +23,23 @@ import logging
 
 from custom_components.one2track.client import (
     One2TrackConfig,
-    TrackerDevice,
-    AuthenticationError
+    AuthenticationError,
+    TransientError
 )
 from custom_components.one2track.client import get_client
+from .hub import async_get_hub
+from .storage import One2TrackStore
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def install_first_login(username, password) -> List[TrackerDevice]:
+async def install_first_login(hass, username, password) -> Tuple[str, str]:
+    """Log in, returning the account id and the session cookie."""
     config = One2TrackConfig(username=username, password=password)
-    client = get_client(config)
+    client = get_client(config, async_get_hub(hass).session)
     account_id = await client.install()
-    return account_id
+    return account_id, client.cookie
 
 
 class One2TrackConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -38,12 +50,18 @@ class One2TrackConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         self._prefix = DEFAULT_PREFIX
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return One2TrackOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
         errors = {}
         user_input = user_input or {}
         if user_input:
             try:
-                account_id = await install_first_login(
+                account_id, cookie = await install_first_login(
+                    self.hass,
                     user_input[CONF_USER_NAME],
                     user_input[CONF_PASSWORD]
                 )
@@ -56,12 +74,17 @@ class One2TrackConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 await self.async_set_unique_id(user_input[CONF_ID])
                 self._abort_if_unique_id_configured()
 
+                # Hand the fresh session over to the config entry so setup does not log in again
+                await One2TrackStore(self.hass, account_id).async_save_session(cookie, account_id)
+
                 return self.async_create_entry(
                     title=f"{user_input[CONF_USER_NAME]}/{user_input[CONF_ID]}",
                     data=user_input,
                 )
             except AuthenticationError:
                 errors["base"] = "authentication_error"
+            except TransientError:
+                errors["base"] = "cannot_connect"
 
         return self.async_show_form(
             step_id="user",
@@ -73,3 +96,51 @@ class One2TrackConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ),
             errors=errors,
         )
+
+
+class One2TrackOptionsFlow(config_entries.OptionsFlow):
+
+    def __init__(self, config_entry) -> None:
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_MIN_UPDATE_INTERVAL] > user_input[CONF_MAX_UPDATE_INTERVAL]:
+                errors["base"] = "invalid_interval_bounds"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self._config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_MIN_UPDATE_INTERVAL,
+                        default=options.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_RATE_SEC),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Required(
+                        CONF_MAX_UPDATE_INTERVAL,
+                        default=options.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_RATE_SEC),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10)),
+                    vol.Required(
+                        CONF_FILTER_JITTER,
+                        default=options.get(CONF_FILTER_JITTER, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_COMPACT_RECORDING,
+                        default=options.get(CONF_COMPACT_RECORDING, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_COLLECT_METRICS,
+                        default=options.get(CONF_COLLECT_METRICS, False),
+                    ): bool,
+                    vol.Required(
+                        CONF_PUSH_PORT,
+                        default=options.get(CONF_PUSH_PORT, 0),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=65535)),
+                }
+            ),
+            errors=errors,
+        )
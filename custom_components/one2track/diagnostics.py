@@ -0,0 +1,34 @@
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .common import CONF_ID, CONF_PASSWORD, CONF_USER_NAME, DOMAIN
+from .hub import async_get_hub
+
+TO_REDACT = {CONF_USER_NAME, CONF_PASSWORD, "title"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> Dict[str, Any]:
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    hub = async_get_hub(hass)
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "polling": {
+            "update_interval": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+            "last_update_success": coordinator.last_update_success,
+            "lag": hub.lag.get(entry.data[CONF_ID]),
+            "accounts": len(hub.clients),
+            "spacing": hub.spacing,
+        },
+        "circuit": {
+            "state": coordinator.breaker.state,
+            "failures": coordinator.breaker.failures,
+            "last_failure": coordinator.breaker.last_failure,
+            "retry_in": coordinator.breaker.retry_in,
+        },
+        "devices": len(coordinator.data or {}),
+        "metrics": coordinator.api_client.metrics.as_dict() if coordinator.api_client.metrics else None,
+    }
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Set, Tuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .client import Device
+from .common import DOMAIN, SIGNAL_DEVICE_UPDATE
+
+
+class One2TrackEntity(Entity):
+    """
+    Base for entities that belong to a single One2Track device.
+
+    Unlike a CoordinatorEntity it does not listen to every refresh. The
+    coordinator signals per device uuid, so only entities of devices that
+    changed get called back.
+    """
+
+    _attr_should_poll = False
+
+    # Device fields this entity renders; it only writes state when one of them changes
+    _watched_fields: FrozenSet[str] = frozenset()
+
+    def __init__(self, coordinator, device):
+        self.coordinator = coordinator
+        self._device = device
+        self._uuid = device.uuid
+        self._last_update_success = None
+        self._cache: Dict[str, Tuple[Any, Any]] = {}
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # The state written when the entity is added reflects the current availability
+        self._last_update_success = self.coordinator.last_update_success
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_DEVICE_UPDATE.format(self._uuid), self._handle_coordinator_update
+        ))
+
+    @property
+    def available(self) -> bool:
+        # Don't show the setup record of a device that left the account
+        return self.coordinator.last_update_success and self._uuid in (self.coordinator.data or {})
+
+    async def async_update(self) -> None:
+        """Only used by the generic entity update service."""
+        await self.coordinator.async_request_refresh()
+
+    def _get_device_data(self) -> Device:
+        """The device's current record, or the one it was set up with if it vanished."""
+        return self.coordinator.get_device(self._uuid) or self._device
+
+    def _cached(self, key: str, build: Callable[[dict], Any]) -> Any:
+        """
+        Return build(device record), memoized until the record changes.
+
+        Snapshots reuse the record object of unchanged devices, so identity is
+        enough to tell whether the cached value is still current.
+        """
+        record = self._get_device_data()
+        cached = self._cache.get(key)
+        if cached is None or cached[0] is not record:
+            cached = self._cache[key] = (record, build(record))
+        return cached[1]
+
+    @property
+    def device_info(self):
+        return self._cached("device_info", _build_device_info)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Skip the state write unless availability or a watched field changed."""
+        success = self.coordinator.last_update_success
+        if success == self._last_update_success and not self.coordinator.has_changed(
+            self._uuid, self._watched_fields
+        ):
+            return
+        self._last_update_success = success
+        self.async_write_ha_state()
+
+
+@callback
+def async_setup_device_entities(
+    entry: ConfigEntry,
+    coordinator,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[[Device], Iterable[Entity]],
+) -> None:
+    """
+    Add create_entities(device) for every device, now and whenever one joins the account.
+
+    Devices that left are dropped from the device registry by the coordinator,
+    which removes their entities; they get new ones if they come back.
+    """
+    known: Set[str] = set()
+
+    @callback
+    def _add_new_devices() -> None:
+        uuids = (coordinator.data or {}).keys()
+        if uuids == known:
+            return
+        known.intersection_update(uuids)
+        new = [device for uuid, device in coordinator.data.items() if uuid not in known]
+        known.update(device.uuid for device in new)
+        entities = [entity for device in new for entity in create_entities(device)]
+        if entities:
+            async_add_entities(entities)
+
+    _add_new_devices()
+    entry.async_on_unload(coordinator.async_add_listener(_add_new_devices))
+
+
+def _build_device_info(device: Device) -> dict:
+    return {
+        "identifiers": {(DOMAIN, device.name)},
+        "name": f"One2Track {device.name}",
+        "manufacturer": "One2Track",
+        "model": "GPS watch",
+        "sw_version": device.serial_number or "Unknown",
+    }
@@ -0,0 +1,109 @@
+from dataclasses import dataclass, replace
+from math import sqrt
+from typing import Dict, Iterable, List, Optional
+
+from .client import Device, DeviceLocation
+from .geo import haversine_m
+from .scheduler import MOVING_SPEED_KMH
+
+# Accuracy assumed per location type when the watch doesn't report one
+DEFAULT_ACCURACY_M = {
+    "GPS": 20.0,
+    "WIFI": 60.0,
+    "LBS": 500.0,
+}
+UNKNOWN_ACCURACY_M = 100.0
+# Never trust a fix more than this, so the estimate keeps adapting
+MIN_ACCURACY_M = 5.0
+# GPS fixes from fewer satellites than this are treated as weak
+MIN_GOOD_SATELLITES = 4
+# How many standard deviations a jump must be to count as real movement
+MOVEMENT_Z = 3.0
+
+
+def fix_accuracy(location: DeviceLocation) -> float:
+    """Best guess of a fix's 1-sigma error in metres."""
+    location_type = (location.location_type or "").upper()
+    accuracy = location.accuracy or DEFAULT_ACCURACY_M.get(location_type, UNKNOWN_ACCURACY_M)
+    if location_type == "GPS" and location.satellite_count is not None \
+            and location.satellite_count < MIN_GOOD_SATELLITES:
+        accuracy *= 2
+    return max(accuracy, MIN_ACCURACY_M)
+
+
+@dataclass
+class _Estimate:
+    latitude: float
+    longitude: float
+    variance: float
+    # Position currently handed to entities, and its variance
+    published: DeviceLocation
+    published_variance: float
+
+
+class JitterFilter:
+    """
+    Suppress position jitter of stationary watches.
+
+    While a watch stays within the combined uncertainty of its estimate and
+    the new fix, fixes are folded into an inverse-variance weighted estimate
+    and the published position is held. The published position only moves
+    when a fix is statistically far from the estimate, the watch reports
+    speed, or the estimate itself drifted further from what was published
+    than the published position's own uncertainty.
+    """
+
+    def __init__(self, z: float = MOVEMENT_Z) -> None:
+        self.z = z
+        self._estimates: Dict[str, _Estimate] = {}
+
+    def apply(self, devices: Iterable[Device]) -> List[Device]:
+        seen = set()
+        filtered = []
+        for device in devices:
+            seen.add(device.uuid)
+            filtered.append(self._filter(device))
+
+        for uuid in self._estimates.keys() - seen:
+            del self._estimates[uuid]
+        return filtered
+
+    def _filter(self, device: Device) -> Device:
+        location = device.last_location
+        if location.latitude is None or location.longitude is None:
+            return device
+
+        variance = fix_accuracy(location) ** 2
+        estimate: Optional[_Estimate] = self._estimates.get(device.uuid)
+        if estimate is None or self._is_moving(estimate, location, variance):
+            self._estimates[device.uuid] = _Estimate(
+                location.latitude, location.longitude, variance, location, variance
+            )
+            return device
+
+        # Stationary: fold the fix into the estimate
+        weight = estimate.variance / (estimate.variance + variance)
+        estimate.latitude += (location.latitude - estimate.latitude) * weight
+        estimate.longitude += (location.longitude - estimate.longitude) * weight
+        estimate.variance = max(estimate.variance * variance / (estimate.variance + variance), MIN_ACCURACY_M ** 2)
+
+        published = estimate.published
+        drift = haversine_m(published.latitude, published.longitude, estimate.latitude, estimate.longitude)
+        if drift > self.z * sqrt(estimate.published_variance):
+            published = estimate.published = replace(
+                location, latitude=estimate.latitude, longitude=estimate.longitude
+            )
+            estimate.published_variance = estimate.variance
+
+        return replace(device, last_location=replace(
+            location,
+            latitude=published.latitude,
+            longitude=published.longitude,
+            address=published.address,
+        ))
+
+    def _is_moving(self, estimate: _Estimate, location: DeviceLocation, variance: float) -> bool:
+        if location.speed is not None and location.speed >= MOVING_SPEED_KMH:
+            return True
+        distance = haversine_m(estimate.latitude, estimate.longitude, location.latitude, location.longitude)
+        return distance > self.z * sqrt(estimate.variance + variance)
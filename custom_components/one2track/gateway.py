@@ -0,0 +1,197 @@
+"""
+Local gateway for watches that report straight to Home Assistant.
+
+The watches talk to their cloud gateway over a plain TCP text protocol, the
+one shared by most SeTracker style watches. Frames look like
+
+    [3G*8800000015*000C*LK,50,100,85]
+
+with the vendor, the watch id, the content length in hex and the content.
+A watch whose server address is pointed at this gateway (usually with an SMS
+command, see the watch's manual) delivers its heartbeats (LK) and location
+reports (UD, UD2, AL) here instead, and they go into the coordinator snapshot
+as soon as they arrive.
+
+The protocol has no authentication: only expose the port to your watches.
+"""
+import asyncio
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from .client import DeviceLocation
+from .common import LOGGER
+from .filters import fix_accuracy
+
+# A watch counts as pushing while it was heard from this recently; the
+# heartbeat interval of most watches is 5 minutes
+PUSH_STALE_SEC = 360
+
+# A frame longer than this is garbage, or someone probing the port
+MAX_FRAME_BYTES = 16 * 1024
+
+_HEADER = re.compile(rb"\[([0-9A-Za-z]{2})\*([0-9A-Za-z]+)\*([0-9A-Fa-f]{4})\*")
+
+# Commands the watch expects to be echoed back
+_ACKNOWLEDGED = frozenset({"LK", "AL", "TKQ", "TKQ2"})
+_LOCATION_COMMANDS = frozenset({"UD", "UD2", "AL"})
+
+
+def encode_frame(vendor: str, watch_id: str, content: str) -> bytes:
+    payload = content.encode()
+    return b"[%s*%s*%04X*%s]" % (vendor.encode(), watch_id.encode(), len(payload), payload)
+
+
+def parse_frames(buffer: bytearray) -> Iterator[Tuple[str, str, bytes]]:
+    """
+    Yield (vendor, watch id, content) for every complete frame in buffer.
+
+    Consumed bytes are removed from buffer; an incomplete frame is left for
+    the next read.
+    """
+    while True:
+        start = buffer.find(b"[")
+        if start < 0:
+            buffer.clear()
+            return
+        match = _HEADER.match(buffer, start)
+        if match is None:
+            if len(buffer) - start < 32:
+                # Header may still be on its way
+                del buffer[:start]
+                return
+            del buffer[:start + 1]
+            continue
+
+        end = match.end() + int(match.group(3), 16)
+        if len(buffer) <= end:
+            del buffer[:start]
+            return
+        if buffer[end] != ord("]"):
+            del buffer[:start + 1]
+            continue
+
+        yield match.group(1).decode(), match.group(2).decode(), bytes(buffer[match.end():end])
+        del buffer[:end + 1]
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_report(content: str) -> Optional[Dict[str, Any]]:
+    """
+    DeviceLocation fields reported by a frame's content, or None if it reports nothing.
+
+    A location without a valid fix (V) only updates battery and communication.
+    """
+    command, _, arguments = content.partition(",")
+    now = datetime.now(timezone.utc)
+    parts = arguments.split(",") if arguments else []
+
+    if command == "LK":
+        fields: Dict[str, Any] = {"last_communication": now}
+        if len(parts) >= 3 and _to_int(parts[2]) is not None:
+            fields["battery_percentage"] = _to_int(parts[2])
+        return fields
+
+    if command not in _LOCATION_COMMANDS or len(parts) < 13:
+        return None
+
+    (date, time, valid, latitude, north_south, longitude, east_west,
+     speed, _direction, altitude, satellites, _gsm, battery) = parts[:13]
+    fields = {"last_communication": now, "battery_percentage": _to_int(battery)}
+    if valid != "A":
+        return fields
+
+    try:
+        timestamp = datetime.strptime(date + time, "%d%m%y%H%M%S").replace(tzinfo=timezone.utc)
+        latitude = float(latitude) * (-1 if north_south == "S" else 1)
+        longitude = float(longitude) * (-1 if east_west == "W" else 1)
+        speed = float(speed)
+        altitude = float(altitude)
+    except ValueError:
+        LOGGER.debug("Ignoring malformed location report: %s", content)
+        return None
+
+    satellite_count = _to_int(satellites)
+    fields.update(
+        last_location_update=timestamp,
+        latitude=latitude,
+        longitude=longitude,
+        speed=speed,
+        altitude=altitude,
+        satellite_count=satellite_count,
+        location_type="GPS",
+        accuracy=fix_accuracy(DeviceLocation(location_type="GPS", satellite_count=satellite_count)),
+        # The watch doesn't report an address and the old one no longer applies
+        address=None,
+    )
+    return fields
+
+
+class WatchProtocol(asyncio.Protocol):
+    """One watch connection."""
+
+    def __init__(self, on_report: Callable[[str, Dict[str, Any]], bool], connections: Set[asyncio.Transport]) -> None:
+        self._on_report = on_report
+        self._connections = connections
+        self._buffer = bytearray()
+        self._transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport) -> None:
+        self._transport = transport
+        self._connections.add(transport)
+
+    def connection_lost(self, exc) -> None:
+        self._connections.discard(self._transport)
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        for vendor, watch_id, content in parse_frames(self._buffer):
+            self._handle_frame(vendor, watch_id, content.decode(errors="replace"))
+        if len(self._buffer) > MAX_FRAME_BYTES:
+            LOGGER.debug("Dropping connection sending oversized frames")
+            self._transport.close()
+
+    def _handle_frame(self, vendor: str, watch_id: str, content: str) -> None:
+        command = content.partition(",")[0]
+        fields = parse_report(content)
+        if fields is not None and not self._on_report(watch_id, fields):
+            LOGGER.debug("Report from unknown watch %s", watch_id)
+        if command in _ACKNOWLEDGED:
+            self._transport.write(encode_frame(vendor, watch_id, command))
+
+
+class WatchGateway:
+    """TCP server feeding watch reports to on_report(watch id, location fields)."""
+
+    def __init__(self, on_report: Callable[[str, Dict[str, Any]], bool]) -> None:
+        self._on_report = on_report
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Transport] = set()
+
+    @property
+    def port(self) -> Optional[int]:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def async_start(self, port: int, host: Optional[str] = None) -> None:
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: WatchProtocol(self._on_report, self._connections), host, port
+        )
+        LOGGER.info("Listening for watch reports on port %s", self.port)
+
+    async def async_stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Watches keep their connection open; don't wait for them to hang up
+            for transport in list(self._connections):
+                transport.close()
+            await self._server.wait_closed()
+            self._server = None
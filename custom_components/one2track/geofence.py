@@ -0,0 +1,157 @@
+from math import cos, floor, radians
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from .client import Device
+from .geo import EARTH_RADIUS_M, haversine_m
+
+# Size of a spatial index cell in degrees, roughly 11 km north-south
+CELL_DEG = 0.1
+# Zones spanning more cells than this in either direction skip the index and
+# are checked against every device instead
+MAX_INDEXED_CELLS = 8
+# Zones are indexed with their radius padded by this much, since a fix counts as
+# inside within radius + accuracy. Less accurate fixes are checked against every zone.
+INDEXED_ACCURACY_M = 1000.0
+METRES_PER_DEG = 111320.0
+
+
+class Zone(NamedTuple):
+    entity_id: str
+    latitude: float
+    longitude: float
+    radius: float
+
+
+class ZoneEvent(NamedTuple):
+    uuid: str
+    zone: str
+    event: str  # "enter" or "leave"
+
+
+def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return floor(latitude / CELL_DEG), floor(longitude / CELL_DEG)
+
+
+class GeofenceEngine:
+    """
+    Evaluate all devices of a snapshot against all zones in one pass.
+
+    Zones are indexed on a coarse lat/lon grid so each device is only tested
+    against zones overlapping its cell. The remaining device/zone pairs get
+    their distances computed together, vectorized when numpy is available.
+    Only transitions between snapshots are reported.
+    """
+
+    def __init__(self) -> None:
+        self.zones: Tuple[Zone, ...] = ()
+        self.membership: Dict[str, FrozenSet[str]] = {}
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._unindexed: List[int] = []
+
+    def set_zones(self, zones: Iterable[Zone]) -> bool:
+        """Rebuild the index when the zones changed, returning whether they did."""
+        zones = tuple(zones)
+        if zones == self.zones:
+            return False
+
+        self.zones = zones
+        self._grid = {}
+        self._unindexed = []
+        for index, zone in enumerate(zones):
+            reach = zone.radius + INDEXED_ACCURACY_M
+            lat_span = reach / METRES_PER_DEG
+            lon_span = reach / (METRES_PER_DEG * max(cos(radians(zone.latitude)), 0.01))
+            south, west = _cell(zone.latitude - lat_span, zone.longitude - lon_span)
+            north, east = _cell(zone.latitude + lat_span, zone.longitude + lon_span)
+            if north - south > MAX_INDEXED_CELLS or east - west > MAX_INDEXED_CELLS:
+                self._unindexed.append(index)
+                continue
+            for row in range(south, north + 1):
+                for column in range(west, east + 1):
+                    self._grid.setdefault((row, column), []).append(index)
+        return True
+
+    def _candidate_pairs(self, positions: List[Tuple[float, float, float]]) -> Tuple[List[int], List[int]]:
+        device_indices = []
+        zone_indices = []
+        every_zone = range(len(self.zones))
+        for device_index, (latitude, longitude, accuracy) in enumerate(positions):
+            if accuracy > INDEXED_ACCURACY_M:
+                candidates = every_zone
+            else:
+                candidates = (*self._grid.get(_cell(latitude, longitude), ()), *self._unindexed)
+            for zone_index in candidates:
+                device_indices.append(device_index)
+                zone_indices.append(zone_index)
+        return device_indices, zone_indices
+
+    def _inside(self, positions, device_indices, zone_indices) -> List[bool]:
+        # Same rule as Home Assistant's zone matching: the fix is inside when the
+        # distance to the centre is less than the zone radius plus the fix accuracy.
+        if np is not None:
+            position = np.array(positions, dtype=float)[device_indices]
+            zone = np.array([self.zones[index][1:] for index in zone_indices], dtype=float)
+            lat1, lon1 = np.radians(position[:, 0]), np.radians(position[:, 1])
+            lat2, lon2 = np.radians(zone[:, 0]), np.radians(zone[:, 1])
+            a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+            distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+            return (distance < zone[:, 2] + position[:, 2]).tolist()
+
+        inside = []
+        for device_index, zone_index in zip(device_indices, zone_indices):
+            latitude, longitude, accuracy = positions[device_index]
+            zone = self.zones[zone_index]
+            distance = haversine_m(latitude, longitude, zone.latitude, zone.longitude)
+            inside.append(distance < zone.radius + accuracy)
+        return inside
+
+    def evaluate(self, devices: Iterable[Device]) -> Dict[str, FrozenSet[str]]:
+        """Return the zones each located device is in."""
+        uuids = []
+        positions = []
+        for device in devices:
+            location = device.last_location
+            if location.latitude is None or location.longitude is None:
+                continue
+            uuids.append(device.uuid)
+            positions.append((location.latitude, location.longitude, location.accuracy or 0.0))
+
+        zones: Dict[str, set] = {uuid: set() for uuid in uuids}
+        if positions and self.zones:
+            device_indices, zone_indices = self._candidate_pairs(positions)
+            if device_indices:
+                inside = self._inside(positions, device_indices, zone_indices)
+                for device_index, zone_index, is_inside in zip(device_indices, zone_indices, inside):
+                    if is_inside:
+                        zones[uuids[device_index]].add(self.zones[zone_index].entity_id)
+
+        return {uuid: frozenset(entered) for uuid, entered in zones.items()}
+
+    def update(self, devices: Iterable[Device]) -> List[ZoneEvent]:
+        """
+        Evaluate devices and return their enter/leave events since the last evaluation.
+
+        Devices not passed in keep their previous zones, so callers only need to
+        pass devices that moved unless the zones themselves changed.
+        """
+        membership = self.evaluate(devices)
+        events = []
+        for uuid, current in membership.items():
+            previous: Optional[FrozenSet[str]] = self.membership.get(uuid)
+            if previous is None:
+                # First sighting only sets the baseline
+                continue
+            events.extend(ZoneEvent(uuid, zone, "leave") for zone in sorted(previous - current))
+            events.extend(ZoneEvent(uuid, zone, "enter") for zone in sorted(current - previous))
+
+        self.membership.update(membership)
+        return events
+
+    def remove(self, uuid: str) -> None:
+        """Forget a device, so it starts from a new baseline if it comes back."""
+        self.membership.pop(uuid, None)
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left
+from math import isnan, nan
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .client import Device
+from .geo import haversine_m
+
+# One day of fixes at the default poll rate
+DEFAULT_HISTORY_SIZE = 1440
+
+# Fixes closer than this to the newest one count as the same location
+SAME_LOCATION_RADIUS_M = 100.0
+
+
+def _or_nan(value) -> float:
+    return nan if value is None else value
+
+
+class LocationHistory:
+    """
+    Bounded ring buffer of location fixes for a single device.
+
+    Each column is a typed array, so a fix costs a few dozen bytes and appending
+    is O(1). Fixes are stored in time order, which lets windowed queries find
+    their start with a binary search.
+    """
+
+    __slots__ = ("capacity", "_start", "_timestamp", "_latitude", "_longitude", "_accuracy", "_speed", "_battery")
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_SIZE) -> None:
+        self.capacity = capacity
+        self._start = 0
+        self._timestamp = array("d")
+        self._latitude = array("d")
+        self._longitude = array("d")
+        self._accuracy = array("d")
+        self._speed = array("d")
+        self._battery = array("d")
+
+    def __len__(self) -> int:
+        return len(self._timestamp)
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        if not self._timestamp:
+            return None
+        return self._timestamp[self._start - 1]
+
+    def append(self, timestamp: float, latitude: float, longitude: float,
+               accuracy: float = None, speed: float = None, battery: float = None) -> None:
+        values = (timestamp, latitude, longitude, _or_nan(accuracy), _or_nan(speed), _or_nan(battery))
+        columns = (self._timestamp, self._latitude, self._longitude, self._accuracy, self._speed, self._battery)
+
+        if len(self._timestamp) < self.capacity:
+            for column, value in zip(columns, values):
+                column.append(value)
+            return
+
+        # Full: overwrite the oldest fix
+        for column, value in zip(columns, values):
+            column[self._start] = value
+        self._start = (self._start + 1) % self.capacity
+
+    def add_device(self, device: Device) -> bool:
+        """Append the device's last location unless it was already recorded."""
+        location = device.last_location
+        if location.last_location_update is None or location.latitude is None or location.longitude is None:
+            return False
+
+        timestamp = location.last_location_update.timestamp()
+        last = self.last_timestamp
+        if last is not None and timestamp <= last:
+            return False
+
+        self.append(timestamp, location.latitude, location.longitude,
+                    location.accuracy, location.speed, location.battery_percentage)
+        return True
+
+    def _position(self, offset: int) -> int:
+        return (self._start + offset) % len(self._timestamp)
+
+    def _offsets(self, since: float = None) -> range:
+        """Chronological offsets of all fixes at or after since."""
+        size = len(self._timestamp)
+        first = 0
+        if since is not None:
+            first = bisect_left(range(size), since, key=lambda offset: self._timestamp[self._position(offset)])
+        return range(first, size)
+
+    def distance(self, since: float = None) -> float:
+        """Metres travelled between the fixes in the window."""
+        total = 0.0
+        previous = None
+        for offset in self._offsets(since):
+            index = self._position(offset)
+            current = (self._latitude[index], self._longitude[index])
+            if previous is not None:
+                total += haversine_m(previous[0], previous[1], current[0], current[1])
+            previous = current
+        return total
+
+    def max_speed(self, since: float = None) -> Optional[float]:
+        speeds = [self._speed[self._position(offset)] for offset in self._offsets(since)]
+        speeds = [speed for speed in speeds if not isnan(speed)]
+        return max(speeds, default=None)
+
+    def time_at_location(self, radius_m: float = SAME_LOCATION_RADIUS_M) -> float:
+        """Seconds the device has been within radius_m of its newest fix."""
+        size = len(self._timestamp)
+        if not size:
+            return 0.0
+
+        newest = self._position(size - 1)
+        latitude, longitude = self._latitude[newest], self._longitude[newest]
+        arrived = self._timestamp[newest]
+        for offset in range(size - 2, -1, -1):
+            index = self._position(offset)
+            if haversine_m(latitude, longitude, self._latitude[index], self._longitude[index]) > radius_m:
+                break
+            arrived = self._timestamp[index]
+        return self._timestamp[newest] - arrived
+
+    def fixes(self, since: float = None) -> Iterator[Dict[str, Optional[float]]]:
+        for offset in self._offsets(since):
+            index = self._position(offset)
+            yield {
+                "timestamp": self._timestamp[index],
+                "latitude": self._latitude[index],
+                "longitude": self._longitude[index],
+                "accuracy": None if isnan(self._accuracy[index]) else self._accuracy[index],
+                "speed": None if isnan(self._speed[index]) else self._speed[index],
+                "battery": None if isnan(self._battery[index]) else self._battery[index],
+            }
+
+
+class FleetHistory:
+    """LocationHistory per device uuid, fed from every coordinator snapshot."""
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_SIZE) -> None:
+        self.capacity = capacity
+        self.devices: Dict[str, LocationHistory] = {}
+
+    def get(self, uuid: str) -> Optional[LocationHistory]:
+        return self.devices.get(uuid)
+
+    def record(self, devices: Iterable[Device]) -> List[str]:
+        """Record every device's last fix, returning the uuids that got a new one."""
+        updated = []
+        for device in devices:
+            history = self.devices.get(device.uuid)
+            if history is None:
+                history = self.devices[device.uuid] = LocationHistory(self.capacity)
+            if history.add_device(device):
+                updated.append(device.uuid)
+        return updated
+
+    def remove(self, uuid: str) -> None:
+        self.devices.pop(uuid, None)
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Dict
+
+from aiohttp import ClientSession, DummyCookieJar
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .client import GpsClient, One2TrackConfig, get_client
+from .common import DEFAULT_MIN_UPDATE_RATE_SEC, DOMAIN, LOGGER
+
+DATA_HUB = f"{DOMAIN}_hub"
+
+
+def async_get_hub(hass: HomeAssistant) -> "One2TrackHub":
+    if DATA_HUB not in hass.data:
+        hass.data[DATA_HUB] = One2TrackHub(hass)
+    return hass.data[DATA_HUB]
+
+
+class One2TrackHub:
+    """
+    Owns the API clients of all configured accounts.
+
+    All clients share one session on Home Assistant's pooled connector, and account
+    refreshes are spaced out evenly over the fastest poll interval so several
+    accounts never hit one2trackgps.com in lockstep.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._session: ClientSession = None
+        self.clients: Dict[str, GpsClient] = {}
+        self.lag: Dict[str, float] = {}
+        self._min_intervals: Dict[str, int] = {}
+        self._slot_lock = asyncio.Lock()
+        self._last_slot = 0.0
+
+    @property
+    def session(self) -> ClientSession:
+        # The clients send their own session cookie, so nothing may leak
+        # between accounts through a shared cookie jar.
+        if self._session is None:
+            self._session = async_create_clientsession(self.hass, cookie_jar=DummyCookieJar())
+        return self._session
+
+    def create_client(self, config: One2TrackConfig, min_interval: int = DEFAULT_MIN_UPDATE_RATE_SEC) -> GpsClient:
+        client = get_client(config, self.session)
+        self.clients[config.id] = client
+        self._min_intervals[config.id] = min_interval
+        return client
+
+    def remove_client(self, account_id: str) -> None:
+        self.clients.pop(account_id, None)
+        self._min_intervals.pop(account_id, None)
+        self.lag.pop(account_id, None)
+
+    @property
+    def spacing(self) -> float:
+        """Minimum number of seconds between two account refreshes."""
+        if len(self.clients) < 2:
+            return 0.0
+        return min(self._min_intervals.values()) / len(self.clients)
+
+    async def async_wait_for_slot(self, account_id: str) -> None:
+        """Wait until this account may refresh, recording how long it was held back."""
+        loop = self.hass.loop
+        async with self._slot_lock:
+            now = loop.time()
+            wait = max(self._last_slot + self.spacing - now, 0.0)
+            if wait:
+                LOGGER.debug("Delaying refresh of account %s by %.1fs", account_id, wait)
+                await asyncio.sleep(wait)
+            self._last_slot = now + wait
+        self.lag[account_id] = wait
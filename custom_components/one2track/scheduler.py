@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from .client import Device, DeviceLocation
+from .common import DEFAULT_UPDATE_RATE_SEC, LOGGER
+from .geo import haversine_m
+
+# A device counts as moving above this speed (km/h) or when its reported
+# position moved further than this many metres since the previous poll.
+MOVING_SPEED_KMH = 3.0
+MOVING_DISTANCE_M = 75.0
+
+
+class DeviceActivity(NamedTuple):
+    latitude: Optional[float]
+    longitude: Optional[float]
+    last_location_update: Optional[datetime]
+    battery_percentage: Optional[int]
+
+
+class AdaptivePollScheduler:
+    """
+    Derive the next account poll interval from what the devices are doing.
+
+    The portal only returns the whole account at once, so the account is
+    polled as fast as its most active device needs: the minimum interval while
+    any device moves, doubling from the default interval for every poll in
+    which all devices were stationary, up to the maximum interval.
+    """
+
+    def __init__(self, min_interval: int, max_interval: int, base_interval: int = DEFAULT_UPDATE_RATE_SEC):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.base_interval = min(max(base_interval, self.min_interval), self.max_interval)
+        self._activity: Dict[str, DeviceActivity] = {}
+        self._idle_polls = 0
+
+    def _is_moving(self, uuid: str, location: DeviceLocation) -> bool:
+        current = DeviceActivity(
+            location.latitude,
+            location.longitude,
+            location.last_location_update,
+            location.battery_percentage,
+        )
+        previous = self._activity.get(uuid)
+        self._activity[uuid] = current
+
+        if previous is None:
+            return False
+
+        # Battery going up means the watch sits on its charger
+        if (
+            current.battery_percentage is not None
+            and previous.battery_percentage is not None
+            and current.battery_percentage > previous.battery_percentage
+        ):
+            return False
+
+        if location.speed is not None and location.speed >= MOVING_SPEED_KMH:
+            return True
+
+        if current.last_location_update == previous.last_location_update:
+            return False
+
+        if None in (current.latitude, current.longitude, previous.latitude, previous.longitude):
+            return False
+
+        return haversine_m(
+            previous.latitude, previous.longitude, current.latitude, current.longitude
+        ) >= MOVING_DISTANCE_M
+
+    def next_interval(self, devices: Iterable[Device], count_idle: bool = True) -> timedelta:
+        """
+        Interval until the next poll.
+
+        Extra polls, like those waiting for a requested fix, pass count_idle=False
+        so they don't push the stationary backoff further out.
+        """
+        moving = False
+        seen = set()
+        for device in devices:
+            seen.add(device.uuid)
+            # Evaluate every device so each one's activity history stays current
+            if self._is_moving(device.uuid, device.last_location):
+                moving = True
+
+        for uuid in self._activity.keys() - seen:
+            del self._activity[uuid]
+
+        if moving:
+            self._idle_polls = 0
+            seconds = self.min_interval
+        else:
+            seconds = min(self.base_interval * 2 ** self._idle_polls, self.max_interval)
+            if count_idle and seconds < self.max_interval:
+                self._idle_polls += 1
+
+        LOGGER.debug("Next poll in %ss (moving: %s)", seconds, moving)
+        return timedelta(seconds=seconds)
@@ -1,6 +1,14 @@
-from homeassistant.components.sensor import SensorEntity
+from datetime import datetime
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.event import async_track_time_change
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from .common import DOMAIN
+from homeassistant.util import dt as dt_util
+from .common import CONF_COLLECT_METRICS, CONF_COMPACT_RECORDING, CONF_ID, DOMAIN, METADATA_FIELDS
+from .entity import One2TrackEntity, async_setup_device_entities
 import logging
 
 LOGGER = logging.getLogger(__name__)
@@ -25,18 +33,29 @@ ICON_MAPPING = {
     "tariff_type": "mdi:sim",
     "balance_cents": "mdi:currency-eur",
     "host": "mdi:server-network",
-    "port": "mdi:ethernet"
+    "port": "mdi:ethernet",
+    "distance_today": "mdi:map-marker-distance",
+    "max_speed_today": "mdi:speedometer",
+    "time_at_location": "mdi:map-marker-radius",
+}
+
+# Request metrics exposed per account: name, unit, icon
+METRIC_SENSORS = {
+    "last_update_ms": ("Last update duration", "ms", "mdi:timer-outline"),
+    "requests": ("Requests", None, "mdi:swap-vertical"),
+    "errors": ("Request errors", None, "mdi:alert-circle-outline"),
+    "bytes": ("Bytes received", "B", "mdi:download-network"),
+    "relogins": ("Re-logins", None, "mdi:login"),
+    "csrf_fetches": ("CSRF fetches", None, "mdi:key-variant"),
 }
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
     LOGGER.debug(f"Coordinator data structure: {coordinator.data}")
-    devices = coordinator.data
 
-    sensors = []
-    for device in devices:
-        name_prefix = f"{device['name']} watch"
-        sensors.extend([
+    def create_sensors(device):
+        name_prefix = f"{device.name} watch"
+        sensors = [
             One2TrackSensor(coordinator, device, "battery_percentage", f"{name_prefix} Battery Level", "%"),
             One2TrackSensor(coordinator, device, "latitude", f"{name_prefix} Latitude", "°"),
             One2TrackSensor(coordinator, device, "longitude", f"{name_prefix} Longitude", "°"),
@@ -53,20 +72,37 @@ async def async_setup_entry(hass, entry, async_add_entities):
             One2TrackSensor(coordinator, device, "uuid", f"{name_prefix} UUID", None, fallback=device.get("uuid")),
             One2TrackSensor(coordinator, device, "status", f"{name_prefix} Status", None, fallback=device.get("status")),
             One2TrackSensor(coordinator, device, "name", f"{name_prefix} Name", None, fallback=device.get("name")),
-            One2TrackSensor(coordinator, device, "tariff_type", f"{name_prefix} SIM type", None, fallback=device["simcard"].get("tariff_type")),
-            One2TrackSensor(coordinator, device, "balance_cents", f"{name_prefix} Balance", fallback=device["simcard"].get("balance_cents")),
+            One2TrackSensor(coordinator, device, "tariff_type", f"{name_prefix} SIM type", None, fallback=device.simcard.tariff_type),
+            One2TrackSensor(coordinator, device, "balance_cents", f"{name_prefix} Balance", fallback=device.simcard.balance_cents),
             One2TrackSensor(coordinator, device, "host", f"{name_prefix} Host", None),
             One2TrackSensor(coordinator, device, "port", f"{name_prefix} Port", None),
-        ])
-    async_add_entities(sensors, update_before_add=True)
+            One2TrackHistorySensor(coordinator, device, "distance_today", f"{name_prefix} Distance today", "m"),
+            One2TrackHistorySensor(coordinator, device, "max_speed_today", f"{name_prefix} Max speed today", "km/h"),
+            One2TrackHistorySensor(coordinator, device, "time_at_location", f"{name_prefix} Time at location", "s"),
+        ]
+
+        if entry.options.get(CONF_COMPACT_RECORDING):
+            # Metadata is dropped from the tracker attributes, so expose it here
+            for sensor in sensors:
+                if isinstance(sensor, One2TrackSensor) and sensor._attribute in METADATA_FIELDS:
+                    sensor._attr_entity_category = EntityCategory.DIAGNOSTIC
+                    sensor._attr_entity_registry_enabled_default = True
+        return sensors
 
-class One2TrackSensor(CoordinatorEntity, SensorEntity):
+    async_setup_device_entities(entry, coordinator, async_add_entities, create_sensors)
+
+    if entry.options.get(CONF_COLLECT_METRICS):
+        async_add_entities(
+            One2TrackMetricSensor(coordinator, entry.data[CONF_ID], metric) for metric in METRIC_SENSORS
+        )
+
+class One2TrackSensor(One2TrackEntity, SensorEntity):
     def __init__(self, coordinator, device, attribute, name, unit=None, fallback=None):
-        super().__init__(coordinator)
-        self._device = device
+        super().__init__(coordinator, device)
         self._attribute = attribute
+        self._watched_fields = frozenset({attribute})
         self._attr_name = f"{name}"
-        self._attr_unique_id = f"one2track_{device['uuid']}_{attribute}"
+        self._attr_unique_id = f"one2track_{device.uuid}_{attribute}"
         self._attr_unit_of_measurement = unit
         self._fallback = fallback
         self._attr_icon = ICON_MAPPING.get(attribute, "mdi:information-outline")
@@ -95,31 +131,101 @@ class One2TrackSensor(CoordinatorEntity, SensorEntity):
         }
         return device_class_mapping.get(attribute)
 
-    def _get_device_data(self):
-        if isinstance(self.coordinator.data, list):
-            for device_data in self.coordinator.data:
-                if device_data.get("uuid") == self._device["uuid"]:
-                    return device_data
-        elif isinstance(self.coordinator.data, dict):
-            return self.coordinator.data.get(self._device["uuid"], {})
-        return {}
-
     @property
     def state(self):
         device_data = self._get_device_data()
         if self._attribute == "balance_cents":
-            balance_cents = device_data.get("simcard", {}).get(self._attribute, 0)
+            balance_cents = device_data.simcard.balance_cents
             if balance_cents is not None:
                 return round(balance_cents / 100, 2)
             return None
-        return device_data.get("last_location", {}).get(self._attribute, self._fallback)
+        value = device_data.get(self._attribute, self._fallback)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+
+class One2TrackHistorySensor(One2TrackEntity, SensorEntity):
+    """Statistic over the device's in-memory location history."""
+
+    # The history only grows when a new fix is reported
+    _watched_fields = frozenset({"last_location_update"})
+
+    def __init__(self, coordinator, device, statistic, name, unit):
+        super().__init__(coordinator, device)
+        self._statistic = statistic
+        self._attr_name = name
+        self._attr_unique_id = f"one2track_{device.uuid}_{statistic}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_icon = ICON_MAPPING[statistic]
+        self._attr_device_class = {
+            "distance_today": "distance",
+            "max_speed_today": "speed",
+            "time_at_location": "duration",
+        }[statistic]
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._statistic != "time_at_location":
+            # The day window moves at midnight, whether or not a fix comes in
+            self.async_on_remove(async_track_time_change(
+                self.hass, self._handle_midnight, hour=0, minute=0, second=0
+            ))
+
+    @callback
+    def _handle_midnight(self, now: datetime) -> None:
+        self.async_write_ha_state()
 
     @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, self._device["name"])},
-            "name": f"One2Track {self._device['name']}",
+    def native_value(self):
+        history = self.coordinator.history.get(self._uuid)
+        if history is None:
+            return None
+
+        if self._statistic == "time_at_location":
+            return round(history.time_at_location())
+
+        since = dt_util.start_of_local_day().timestamp()
+        if self._statistic == "distance_today":
+            return round(history.distance(since))
+        speed = history.max_speed(since)
+        return None if speed is None else round(speed, 1)
+
+
+class One2TrackMetricSensor(CoordinatorEntity, SensorEntity):
+    """Request metric of the account's client, refreshed with every update."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, account_id, metric):
+        super().__init__(coordinator)
+        name, unit, icon = METRIC_SENSORS[metric]
+        self._metric = metric
+        self._attr_name = f"One2Track {name}"
+        self._attr_unique_id = f"one2track_account_{account_id}_{metric}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_icon = icon
+        self._attr_state_class = (
+            SensorStateClass.MEASUREMENT if metric == "last_update_ms" else SensorStateClass.TOTAL_INCREASING
+        )
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, f"account_{account_id}")},
+            "name": f"One2Track account {account_id}",
             "manufacturer": "One2Track",
-            "model": "GPS watch",
-            "sw_version": self._device.get("serial_number", "Unknown"),
+            "model": "Account",
+            "entry_type": DeviceEntryType.SERVICE,
         }
+
+    @property
+    def native_value(self):
+        value = getattr(self.coordinator.api_client.metrics, self._metric)
+        if self._metric == "last_update_ms" and value is not None:
+            return round(value)
+        return value
+
+    @property
+    def extra_state_attributes(self):
+        if self._metric != "last_update_ms":
+            return None
+        # Time spent per endpoint during the last update
+        return self.coordinator.api_client.metrics.last_update_breakdown
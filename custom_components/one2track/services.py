@@ -0,0 +1,196 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import voluptuous as vol
+from homeassistant.const import ATTR_DEVICE_ID, ENTITY_MATCH_ALL
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+
+from .common import DOMAIN, LOGGER
+
+SERVICE_SEND_DEVICE_COMMAND = "send_device_command"
+SERVICE_SEND_DEVICE_MESSAGE = "send_device_message"
+SERVICE_GET_LOCATION_HISTORY = "get_location_history"
+
+ATTR_CMD_CODE = "cmd_code"
+ATTR_CMD_VALUE = "cmd_value"
+ATTR_CMD_VALUE_PARAM = "cmd_value_param"
+ATTR_HOURS = "hours"
+ATTR_INCLUDE_FIXES = "include_fixes"
+ATTR_MESSAGE = "message"
+
+REFRESH_LOCATION_CMD = "0039"
+
+SEND_DEVICE_COMMAND_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Required(ATTR_CMD_CODE): cv.string,
+        vol.Optional(ATTR_CMD_VALUE): cv.string,
+        vol.Optional(ATTR_CMD_VALUE_PARAM): cv.string,
+    }
+)
+
+SEND_DEVICE_MESSAGE_SCHEMA = vol.Schema(
+    {
+        # Device ids, or "all" for every watch of every account
+        vol.Required(ATTR_DEVICE_ID): vol.Any(
+            vol.All(cv.string, vol.Lower, ENTITY_MATCH_ALL),
+            vol.All(cv.ensure_list, [cv.string]),
+        ),
+        vol.Required(ATTR_MESSAGE): vol.All(cv.string, vol.Length(min=1)),
+    }
+)
+
+GET_LOCATION_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_HOURS, default=24): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(ATTR_INCLUDE_FIXES, default=False): cv.boolean,
+    }
+)
+
+
+def resolve_device_uuids(hass: HomeAssistant, device_ids: List[str]) -> Dict[str, List[str]]:
+    """Map Home Assistant device ids to watch uuids, grouped by config entry."""
+    registry = dr.async_get(hass)
+    targets: Dict[str, List[str]] = {}
+
+    for device_id in device_ids:
+        device = registry.async_get(device_id)
+        if device is None:
+            raise HomeAssistantError(f"Unknown device: {device_id}")
+
+        names = {identifier[1] for identifier in device.identifiers if identifier[0] == DOMAIN}
+        for entry_id in device.config_entries:
+            entry_data = hass.data.get(DOMAIN, {}).get(entry_id)
+            if entry_data is None:
+                continue
+            # Devices are registered by watch name, the API addresses them by uuid
+            for uuid, device_data in (entry_data["coordinator"].data or {}).items():
+                if device_data.name in names:
+                    targets.setdefault(entry_id, []).append(uuid)
+
+    # The same device may be selected more than once
+    return {entry_id: list(dict.fromkeys(uuids)) for entry_id, uuids in targets.items()}
+
+
+def resolve_all_uuids(hass: HomeAssistant) -> Dict[str, List[str]]:
+    """Every watch uuid, grouped by config entry."""
+    return {
+        entry_id: list(entry_data["coordinator"].data or {})
+        for entry_id, entry_data in hass.data.get(DOMAIN, {}).items()
+    }
+
+
+async def _async_send_device_command(hass: HomeAssistant, call: ServiceCall):
+    targets = resolve_device_uuids(hass, call.data[ATTR_DEVICE_ID])
+    cmd_code = call.data[ATTR_CMD_CODE]
+    cmd_value = call.data.get(ATTR_CMD_VALUE)
+
+    async def _send(entry_id, uuids):
+        coordinator = hass.data[DOMAIN][entry_id]["coordinator"]
+        results = await coordinator.api_client.send_device_commands(
+            [(uuid, cmd_code, cmd_value) for uuid in uuids],
+            cmd_value_param=call.data.get(ATTR_CMD_VALUE_PARAM),
+        )
+        if cmd_code == REFRESH_LOCATION_CMD:
+            # Poll until the requested fixes actually arrive
+            for uuid, sent in results.items():
+                if sent:
+                    coordinator.burst.watch(uuid)
+        return results
+
+    results = {}
+    for account_results in await asyncio.gather(
+        *(_send(entry_id, uuids) for entry_id, uuids in targets.items())
+    ):
+        results.update(account_results)
+
+    LOGGER.debug("Command %s sent to %s devices: %s", cmd_code, len(results), results)
+    return {"results": results}
+
+
+async def _async_send_device_message(hass: HomeAssistant, call: ServiceCall):
+    device_ids = call.data[ATTR_DEVICE_ID]
+    if device_ids == ENTITY_MATCH_ALL:
+        targets = resolve_all_uuids(hass)
+    else:
+        targets = resolve_device_uuids(hass, device_ids)
+    message = call.data[ATTR_MESSAGE]
+
+    async def _send(entry_id, uuids):
+        coordinator = hass.data[DOMAIN][entry_id]["coordinator"]
+        return await coordinator.api_client.send_device_messages(uuids, message)
+
+    # Accounts are sent to concurrently, each over its own session
+    results = {}
+    for account_results in await asyncio.gather(
+        *(_send(entry_id, uuids) for entry_id, uuids in targets.items())
+    ):
+        results.update(account_results)
+
+    LOGGER.debug("Message sent to %s devices: %s", len(results), results)
+    return {"results": results}
+
+
+async def _async_get_location_history(hass: HomeAssistant, call: ServiceCall):
+    targets = resolve_device_uuids(hass, call.data[ATTR_DEVICE_ID])
+    since = time.time() - call.data[ATTR_HOURS] * 3600
+
+    results = {}
+    for entry_id, uuids in targets.items():
+        coordinator = hass.data[DOMAIN][entry_id]["coordinator"]
+        for uuid in uuids:
+            history = coordinator.history.get(uuid)
+            if history is None:
+                continue
+            results[uuid] = {
+                "name": coordinator.get_device(uuid).name,
+                "distance": round(history.distance(since)),
+                "max_speed": history.max_speed(since),
+                "time_at_location": round(history.time_at_location()),
+            }
+            if call.data[ATTR_INCLUDE_FIXES]:
+                results[uuid]["fixes"] = list(history.fixes(since))
+
+    return {"devices": results}
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the One2Track services."""
+
+    async def send_device_command(call: ServiceCall):
+        return await _async_send_device_command(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEND_DEVICE_COMMAND,
+        send_device_command,
+        schema=SEND_DEVICE_COMMAND_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def send_device_message(call: ServiceCall):
+        return await _async_send_device_message(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEND_DEVICE_MESSAGE,
+        send_device_message,
+        schema=SEND_DEVICE_MESSAGE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def get_location_history(call: ServiceCall):
+        return await _async_get_location_history(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_LOCATION_HISTORY,
+        get_location_history,
+        schema=GET_LOCATION_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,39 @@
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, Tuple
+
+from .client import Device
+
+
+def changed_fields(old: Device, new: Device) -> FrozenSet[str]:
+    old_fields = old.flatten()
+    new_fields = new.flatten()
+    return frozenset(key for key, value in new_fields.items() if old_fields[key] != value)
+
+
+def build_snapshot(
+    previous: Mapping[str, Device], devices: Iterable[Device]
+) -> Tuple[Mapping[str, Device], Dict[str, FrozenSet[str]]]:
+    """
+    Index devices by uuid and diff them against the previous snapshot.
+
+    Unchanged records keep the object from the previous snapshot, so identity
+    tells consumers a device did not change. Returns the new snapshot and the
+    changed fields per device uuid.
+    """
+    previous = previous or {}
+    snapshot = {}
+    changes = {}
+
+    for device in devices:
+        uuid = device.uuid
+        old = previous.get(uuid)
+        if old is None:
+            changes[uuid] = frozenset(device.flatten())
+        elif old == device:
+            device = old
+            changes[uuid] = frozenset()
+        else:
+            changes[uuid] = changed_fields(old, device)
+        snapshot[uuid] = device
+
+    return MappingProxyType(snapshot), changes
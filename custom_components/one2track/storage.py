@@ -0,0 +1,92 @@
+from typing import Any, Dict, List, Mapping, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .client import Device
+from .common import DOMAIN, LOGGER
+
+STORAGE_VERSION = 1
+SAVE_DELAY_SEC = 10
+# Snapshots change with nearly every poll; write at most this often
+SNAPSHOT_SAVE_DELAY_SEC = 60
+
+
+class One2TrackStore:
+    """
+    Persistent per-account state.
+
+    The session lives in .storage/one2track.<account id> and the last
+    snapshot in .storage/one2track.<account id>.snapshot, so the frequent
+    snapshot writes don't hold up a session change.
+    """
+
+    def __init__(self, hass: HomeAssistant, account_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{account_id}")
+        self._snapshot_store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{account_id}.snapshot")
+        self._data: Dict[str, Any] = {}
+        self._devices: List[Dict[str, Any]] = []
+        self._snapshot: Optional[Mapping[str, Device]] = None
+        self._snapshot_pending = False
+
+    async def async_load(self) -> Dict[str, Any]:
+        self._data = await self._store.async_load() or {}
+        self._devices = (await self._snapshot_store.async_load() or {}).get("devices", [])
+        return self._data
+
+    @property
+    def session_cookie(self) -> str:
+        return self._data.get("session_cookie", "")
+
+    @property
+    def account_id(self) -> str:
+        return self._data.get("account_id", "")
+
+    async def async_save_session(self, cookie: str, account_id: str) -> None:
+        """Write the session immediately, used when handing off from the config flow."""
+        if not self._data:
+            # Keep whatever else is stored for the account
+            await self.async_load()
+        self._data.update(session_cookie=cookie, account_id=account_id)
+        await self._store.async_save(self._data)
+
+    @property
+    def devices(self) -> List[Device]:
+        """The devices of the last saved snapshot."""
+        try:
+            return [Device.from_dict(raw) for raw in self._devices]
+        except (KeyError, TypeError, ValueError) as err:
+            LOGGER.warning("Ignoring unreadable stored snapshot: %s", err)
+            return []
+
+    def _snapshot_to_save(self) -> Dict[str, Any]:
+        # Serialized only when the save fires, not on every refresh
+        self._snapshot_pending = False
+        self._devices = [device.as_dict() for device in self._snapshot.values()]
+        return {"devices": self._devices}
+
+    @callback
+    def async_update_snapshot(self, snapshot: Mapping[str, Device], changed: bool = True) -> None:
+        """
+        Save the latest snapshot within SNAPSHOT_SAVE_DELAY_SEC, if anything in it changed.
+
+        Store.async_delay_save restarts its delay on every call, so it is only
+        called when no save is pending; later refreshes then can't push the
+        write back, and the save picks up the newest snapshot.
+        """
+        self._snapshot = snapshot
+        if changed and not self._snapshot_pending:
+            self._snapshot_pending = True
+            self._snapshot_store.async_delay_save(self._snapshot_to_save, SNAPSHOT_SAVE_DELAY_SEC)
+
+    @callback
+    def async_update_session(self, cookie: str, account_id: str) -> None:
+        """Schedule a save if the session cookie or account id changed."""
+        if cookie == self.session_cookie and account_id == self.account_id:
+            return
+        self._data.update(session_cookie=cookie, account_id=account_id)
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY_SEC)
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+        await self._snapshot_store.async_remove()